@@ -0,0 +1,277 @@
+"""
+Budget-constrained choice of attractions and meals for the local planner, and
+a budget check for LLM-generated plans.
+
+Days are filled slot by slot. Each slot takes the best-scoring open POI that
+fits what is left of the day's allocation, while keeping enough back for the
+cheapest open option in every later slot. A POI's score is its interest-tag
+matches plus a small bonus for catalog order. Sights are not repeated until
+every open one has been used, and meals favour places not yet visited. Each
+step is a few NumPy operations over all candidates, so a 30-day plan over
+hundreds of POIs takes a few milliseconds.
+
+When POIs have coordinates, the plan also keeps travel short:
+- The best affordable sights are split into one compact group per day with
+  balanced k-means.
+- Each day's sights are put in route order, as far as opening hours allow.
+- Meals are picked from the eateries nearest each stop.
+Each day reports the straight-line distance between its stops, in visiting order, as travel_km.
+"""
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from . import geo
+from .poi_catalog import POI, POIArrays, POICatalog, interest_tags
+
+# LLM days may go this far over the daily allocation before they are replaced
+BUDGET_TOLERANCE = float(os.getenv("BUDGET_TOLERANCE", "0.1"))
+
+ATTRACTION_SLOTS = (("morning", 10), ("afternoon", 15), ("evening", 19))
+MEAL_SLOTS = (("breakfast", 8), ("lunch", 13), ("dinner", 19))
+# Share of the daily food allocation each meal aims to use
+MEAL_SHARES = (0.25, 0.33, 0.42)
+# Value lost per earlier visit to the same eatery
+REPEAT_MEAL_PENALTY = 1.5
+# Value lost per km between a meal and the stop it is anchored to
+MEAL_DISTANCE_PENALTY = 0.4
+# Meals are chosen among this many eateries nearest the stop
+MEAL_NEAREST = 4
+
+_COST_RE = re.compile(r"₹\s?(\d[\d,]*)")
+
+
+class Candidates:
+    """
+    Column arrays over one list of POIs and a fixed set of slot hours. Arrays
+    prebuilt by the catalog (POICatalog.arrays) are sliced rather than rebuilt,
+    and their grid index is reused; without them they are built for this list.
+    """
+
+    def __init__(
+        self,
+        city_name: str,
+        pois: List[POI],
+        interests: Iterable[str],
+        hours,
+        exclude_text: str = "",
+        arrays: Optional[POIArrays] = None,
+    ):
+        arrays = arrays if arrays is not None else POIArrays(pois)
+        ids = arrays.ids(pois)
+        self.pois = pois
+        n = len(pois)
+        self.prices = arrays.prices[ids]
+        matches = np.zeros(n)
+        for tag in interest_tags(interests):
+            if tag in arrays.tag_counts:
+                matches += arrays.tag_counts[tag][ids]
+        # Earlier entries (select() keeps catalog order within a rank) are the better-known places
+        prominence = 1.0 - np.arange(n) / max(n, 1)
+        self.scores = 1.0 + matches + 0.5 * prominence
+        slot_hours = np.asarray(hours, dtype=np.float64).reshape(-1, 1)
+        self.open = (arrays.opens[ids] <= slot_hours) & (slot_hours < arrays.closes[ids])
+        exclude_text = exclude_text.lower()
+        if exclude_text:
+            self.allowed = np.array(
+                [poi.display_name(city_name).lower() not in exclude_text for poi in pois], dtype=bool
+            ).reshape(n)
+        else:
+            self.allowed = np.ones(n, dtype=bool)
+        self.uses = np.zeros(n)
+
+        self.coords = arrays.coords[ids]
+        self.located = ~np.isnan(self.coords[:, 0])
+        # The index covers every located POI in arrays; hits are mapped back to candidates
+        self._arrays = arrays
+        self._candidate_at = np.full(len(arrays), -1, dtype=np.intp)
+        self._candidate_at[ids] = np.arange(n)
+
+    def distances_from(self, point) -> np.ndarray:
+        """km from point to every candidate (0 for candidates without coordinates)"""
+        if point is None:
+            return np.zeros(len(self.pois))
+        km = geo.haversine_km(point[0], point[1], self.coords[:, 0], self.coords[:, 1])
+        return np.where(self.located, km, 0.0)
+
+    def near_mask(self, point, k: int, distances: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Mask of the k located candidates closest to point. Few candidates: ranked
+        by distances (from distances_from) when given, as the index would scan
+        them anyway. Otherwise via the grid index.
+        """
+        index, located_ids = self._arrays.index, self._arrays.located_ids
+        if point is None or index is None or not self.located.any():
+            return None
+        if distances is not None and len(self.pois) <= geo.GRID_SCAN_MAX:
+            mask = np.zeros(len(self.pois), dtype=bool)
+            ranked = np.flatnonzero(self.located)
+            mask[ranked[np.argsort(distances[ranked], kind="stable")[:k]]] = True
+            return mask
+        # The index may also hold POIs that aren't candidates (other price bands): widen until k are found
+        wanted = k
+        while True:
+            hits = self._candidate_at[located_ids[index.nearest(point[0], point[1], wanted)]]
+            hits = hits[hits >= 0]
+            if len(hits) >= k or wanted >= len(located_ids):
+                break
+            wanted *= 2
+        mask = np.zeros(len(self.pois), dtype=bool)
+        mask[hits[:k]] = True
+        return mask
+
+    def fill_day(self, budget: float, values, no_repeat: bool, within=None) -> List[Optional[POI]]:
+        """
+        Pick one POI per slot within budget; values(slot) gives the per-POI value
+        for that slot. within(slot), if given, returns a preferred subset mask
+        (or None), which is used whenever it has an open option.
+        """
+        chosen = []
+        left = float(budget)
+        slots = self.open.shape[0]
+        for slot in range(slots):
+            available = self.allowed & (self.uses == 0) if no_repeat else self.allowed
+            if no_repeat and not (available & self.open[slot]).any():
+                available = self.allowed
+            zone = within(slot) if within else None
+            if zone is not None and (available & zone & self.open[slot]).any():
+                available = available & zone
+
+            cheapest_later = np.where(self.open[slot + 1:] & available, self.prices, np.inf).min(axis=1, initial=np.inf)
+            reserve = cheapest_later[np.isfinite(cheapest_later)].sum()
+            fits = self.open[slot] & available & (self.prices <= left - reserve)
+            slot_values = values(slot)
+            if not fits.any():
+                # Later slots can't all be covered: take the cheapest option that still fits
+                fits = self.open[slot] & available & (self.prices <= left)
+                slot_values = -self.prices
+            if not fits.any():
+                chosen.append(None)
+                continue
+
+            k = int(np.where(fits, slot_values, -np.inf).argmax())
+            self.uses[k] += 1
+            left -= self.prices[k]
+            chosen.append(self.pois[k])
+        return chosen
+
+
+def day_groups(sights: Candidates, daily_activities: int, days: int) -> Optional[List[np.ndarray]]:
+    """One mask per day over spatially compact groups of the best affordable sights"""
+    pool = np.flatnonzero(sights.located & sights.allowed & (sights.prices <= daily_activities))
+    if days < 2 or len(pool) < 2:
+        return None
+    pool = pool[np.argsort(-sights.scores[pool], kind="stable")][:len(ATTRACTION_SLOTS) * days]
+    labels = geo.balanced_kmeans(sights.coords[pool], days)
+    groups = []
+    for label in np.unique(labels):
+        mask = np.zeros(len(sights.pois), dtype=bool)
+        mask[pool[labels == label]] = True
+        groups.append(mask)
+    return groups
+
+
+def order_stops(stops: List[Optional[POI]], hours) -> List[Optional[POI]]:
+    """Reorder a day's stops along the shortest route, if every stop is still open at its new slot"""
+    filled = [slot for slot, poi in enumerate(stops) if poi is not None]
+    located = [stops[slot] for slot in filled if stops[slot].has_coords]
+    if len(located) < 2 or len(located) != len(filled):
+        return stops
+
+    route = geo.route_order(np.array([(poi.lat, poi.lng) for poi in located]))
+    for order in (route, route[::-1]):
+        if all(located[i].is_open(hours[slot]) for i, slot in zip(order, filled)):
+            reordered = list(stops)
+            for i, slot in zip(order, filled):
+                reordered[slot] = located[i]
+            return reordered
+    return stops
+
+
+def _point(*pois: Optional[POI]):
+    """Mean position of the located POIs given, or None"""
+    located = [(poi.lat, poi.lng) for poi in pois if poi is not None and poi.has_coords]
+    return tuple(np.mean(located, axis=0)) if located else None
+
+
+def travel_km(stops: List[Optional[POI]]) -> Optional[float]:
+    located = [(poi.lat, poi.lng) for poi in stops if poi is not None and poi.has_coords]
+    if len(located) < 2:
+        return None
+    return round(geo.path_km(np.array(located)), 1)
+
+
+def optimize_days(
+    city_name: str,
+    attractions: List[POI],
+    eateries: List[POI],
+    interests: Iterable[str],
+    days: int,
+    daily_activities: int,
+    daily_food: int,
+    exclude_text: str = "",
+    catalog: Optional[POICatalog] = None,
+) -> List[Dict[str, Optional[POI]]]:
+    """
+    Per-day {slot: POI or None} for the three sight slots and three meals, plus
+    travel_km. Pass the catalog the POIs were selected from to reuse its arrays.
+    """
+    sight_hours = [hour for _, hour in ATTRACTION_SLOTS]
+    sight_arrays = catalog.arrays(city_name, "attraction") if catalog else None
+    meal_arrays = catalog.arrays(city_name, "eatery") if catalog else None
+    sights = Candidates(city_name, attractions, interests, sight_hours, exclude_text, sight_arrays)
+    meals = Candidates(city_name, eateries, interests, [hour for _, hour in MEAL_SLOTS], exclude_text, meal_arrays)
+    # Meals are worth more the closer they get to their share of the food budget
+    targets = [max(daily_food * share, 1) for share in MEAL_SHARES]
+    groups = day_groups(sights, daily_activities, days)
+
+    plan = []
+    for number in range(days):
+        group = groups[number % len(groups)] if groups else None
+        morning, afternoon, evening = order_stops(
+            sights.fill_day(daily_activities, lambda slot: sights.scores, no_repeat=True, within=lambda slot: group),
+            sight_hours
+        )
+
+        # Breakfast near the first sight, lunch between the first two, dinner near the last
+        anchors = [_point(morning), _point(morning, afternoon), _point(evening or afternoon)]
+        distances = [meals.distances_from(anchor) for anchor in anchors]
+        nearby = [meals.near_mask(anchor, MEAL_NEAREST, km) for anchor, km in zip(anchors, distances)]
+
+        def meal_values(slot):
+            return (
+                meals.scores - REPEAT_MEAL_PENALTY * meals.uses
+                + 0.5 * np.minimum(meals.prices / targets[slot], 1)
+                - MEAL_DISTANCE_PENALTY * distances[slot]
+            )
+
+        breakfast, lunch, dinner = meals.fill_day(
+            daily_food, meal_values, no_repeat=False, within=lambda slot: nearby[slot]
+        )
+        plan.append({
+            "morning": morning, "afternoon": afternoon, "evening": evening,
+            "breakfast": breakfast, "lunch": lunch, "dinner": dinner,
+            "travel_km": travel_km([breakfast, morning, lunch, afternoon, dinner, evening]),
+        })
+    return plan
+
+
+def day_costs(plan: list) -> np.ndarray:
+    """Sum of every ₹ amount mentioned in each day's morning, afternoon and evening"""
+    return np.array([
+        sum(
+            int(amount.replace(",", ""))
+            for slot in ("morning", "afternoon", "evening")
+            for amount in _COST_RE.findall(str(day.get(slot, "")))
+        )
+        for day in plan
+    ], dtype=np.int64)
+
+
+def over_budget_days(plan: list, daily_limit: int, tolerance: float = BUDGET_TOLERANCE) -> List[int]:
+    """Indexes of plan days whose summed costs exceed daily_limit (plus tolerance)"""
+    if not plan:
+        return []
+    return np.flatnonzero(day_costs(plan) > daily_limit * (1 + tolerance)).tolist()
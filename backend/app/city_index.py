@@ -0,0 +1,344 @@
+"""
+In-memory indexes over city names: prefix search for autocomplete, and a
+resolver that maps free text to a city despite typos and old names.
+
+Names are folded: lowercased, accents stripped and whitespace collapsed. The
+folded names are kept in a sorted array together with the start of every later
+word, so "mum" finds both "Mumbai" and "Navi Mumbai". A search bisects to the
+keys that start with the query and returns the best-ranked cities among them.
+Cities are ranked by how many itineraries were planned for them, then by
+population (from geonamescache, when installed), then by name. A one- or
+two-letter prefix can match thousands of keys, so results for those prefixes
+are worked out when the index is built.
+
+resolve() tries, in order:
+  1. the exact name, then the name without case, accents, spaces or punctuation;
+  2. an alias: the well-known renames in ALIAS_GROUPS ("Bombay"), then
+     geonames alternate names;
+  3. trigram overlap with every name and alias, to shortlist candidates that
+     are then ranked by edit similarity.
+A fuzzy match must clearly beat the runner-up. Otherwise the closest cities
+come back as suggestions.
+
+The index is built at startup from city names alone. Loading geonamescache
+takes about half a second and counting itineraries reads part of a large
+table, so warm() does both in a background thread, rebuilds, and recounts
+every CITY_POPULARITY_REFRESH_SECONDS. It is also rebuilt, with the counts it
+already has, when a city is created through the API.
+Cities inserted straight into the database (seed_cities.py), or created by
+another worker process, show up after the next rebuild or restart.
+"""
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from . import models
+from .database import SessionLocal
+
+SEARCH_LIMIT_MAX = 20
+# Prefixes up to this length get their results computed at build time
+PRECOMPUTED_PREFIX = 2
+# Country whose geonames cities give populations and aliases ("" for all)
+GEONAMES_COUNTRY = os.getenv("GEONAMES_COUNTRY", "IN")
+# Similarity (difflib ratio, 0-1) a fuzzy match needs, and its lead over the next city
+RESOLVE_MIN_SCORE = float(os.getenv("CITY_RESOLVE_MIN_SCORE", "0.8"))
+RESOLVE_MIN_MARGIN = float(os.getenv("CITY_RESOLVE_MIN_MARGIN", "0.1"))
+SUGGESTION_MIN_SCORE = 0.6
+SUGGESTIONS = 5
+# Keys rescored by edit similarity after the trigram pass, and the trigram overlap they need
+FUZZY_CANDIDATES = 10
+SHORTLIST_MIN_DICE = 0.2
+
+# Names people still type for renamed cities; whichever one is in the cities table wins
+ALIAS_GROUPS = (
+    ("Mumbai", "Bombay"), ("Bengaluru", "Bangalore"), ("Chennai", "Madras"), ("Kolkata", "Calcutta"),
+    ("Gurugram", "Gurgaon"), ("Pune", "Poona"), ("Thiruvananthapuram", "Trivandrum"),
+    ("Varanasi", "Benares", "Banaras", "Kashi"), ("Kochi", "Cochin"), ("Mysuru", "Mysore"),
+    ("Vadodara", "Baroda"), ("Puducherry", "Pondicherry"), ("Shimla", "Simla"),
+    ("Prayagraj", "Allahabad"), ("Mangaluru", "Mangalore"), ("Kozhikode", "Calicut"),
+    ("Belagavi", "Belgaum"), ("Hubballi", "Hubli"), ("Kalaburagi", "Gulbarga"),
+    ("Visakhapatnam", "Vizag"), ("Kanpur", "Cawnpore"), ("Panaji", "Panjim"),
+)
+
+
+def fold(text: str) -> str:
+    """'  Navi  MUMBAI' -> 'navi mumbai', 'Bhāgalpur' -> 'bhagalpur'"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def squash(text: str) -> str:
+    """fold() without spaces or punctuation: 'Navi-Mumbai ' -> 'navimumbai'"""
+    return re.sub(r"[^0-9a-z]", "", fold(text))
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+_populations: Optional[Dict[str, int]] = None
+# Squashed geonames name -> squashed alternate names
+_alternates: Optional[Dict[str, Set[str]]] = None
+
+
+def load_geonames():
+    """Populations and alternate names from geonamescache; empty if it isn't installed"""
+    global _populations, _alternates
+    if _populations is not None:
+        return
+    populations, alternates = {}, {}
+    try:
+        import geonamescache
+    except ImportError:  # optional: ranking and aliases fall back to what's in the database
+        geonamescache = None
+    if geonamescache:
+        for place in geonamescache.GeonamesCache().get_cities().values():
+            if GEONAMES_COUNTRY and place["countrycode"] != GEONAMES_COUNTRY:
+                continue
+            key = fold(place["name"])
+            populations[key] = max(populations.get(key, 0), place["population"])
+            # Other scripts fold to nothing useful; short ones are mostly codes
+            names = {squash(name) for name in place["alternatenames"] if name.isascii()}
+            alternates.setdefault(squash(place["name"]), set()).update(n for n in names if len(n) >= 4)
+    _alternates = alternates
+    _populations = populations
+
+
+class Resolution:
+    """Outcome of CityIndex.resolve: the city if one clearly matched, else suggestions"""
+
+    def __init__(self, city: Optional[dict], match: Optional[str], suggestions: List[dict]):
+        self.city = city
+        self.match = match
+        self.suggestions = suggestions
+
+    def as_dict(self) -> dict:
+        return {"city": self.city, "match": self.match, "suggestions": self.suggestions}
+
+
+class CityIndex:
+    def __init__(self, cities: Iterable[Tuple[int, str]], popularity: Optional[Dict[str, int]] = None,
+                 population: Optional[Dict[str, int]] = None,
+                 alternates: Optional[Dict[str, Set[str]]] = None):
+        popularity = popularity or {}
+        population = population or {}
+        ranked = sorted(
+            cities, key=lambda c: (-popularity.get(c[1], 0), -population.get(fold(c[1]), 0), c[1])
+        )
+        # Response items in rank order; searches work with positions in this list
+        self.items = [{"id": city_id, "name": name} for city_id, name in ranked]
+
+        entries = []
+        for rank, (_, name) in enumerate(ranked):
+            words = fold(name).split(" ")
+            for start in range(len(words)):
+                entries.append((" ".join(words[start:]), rank))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = [rank for _, rank in entries]
+
+        short: Dict[str, set] = {}
+        for key, rank in entries:
+            for length in range(1, min(PRECOMPUTED_PREFIX, len(key)) + 1):
+                short.setdefault(key[:length], set()).add(rank)
+        self.short = {prefix: sorted(ranks)[:SEARCH_LIMIT_MAX] for prefix, ranks in short.items()}
+
+        self._build_resolver(alternates or {})
+
+    def _build_resolver(self, alternates: Dict[str, Set[str]]):
+        self.exact = {item["name"]: rank for rank, item in enumerate(self.items)}
+        # Squashed key -> ranks; two cities can share one ("Banda", "Bānda")
+        self.squashed: Dict[str, List[int]] = {}
+        for rank, item in enumerate(self.items):
+            self.squashed.setdefault(squash(item["name"]), []).append(rank)
+
+        aliases: Dict[str, Set[int]] = {}
+        for key, ranks in self.squashed.items():
+            for alias in alternates.get(key, ()):
+                if alias not in self.squashed:
+                    aliases.setdefault(alias, set()).update(ranks)
+        # Curated renames go on top, replacing whatever geonames said about the name
+        for group in ALIAS_GROUPS:
+            targets = [self.squashed[squash(name)] for name in group if squash(name) in self.squashed]
+            if not targets:
+                continue
+            for name in group:
+                if squash(name) not in self.squashed:
+                    aliases[squash(name)] = set(targets[0])
+        self.aliases = {alias: sorted(ranks) for alias, ranks in aliases.items()}
+
+        # Trigram postings over every name and alias key
+        self.fuzzy_keys = list(self.squashed) + list(self.aliases)
+        self.fuzzy_ranks = [self.squashed.get(key) or self.aliases[key] for key in self.fuzzy_keys]
+        postings: Dict[str, List[int]] = {}
+        sizes = []
+        for key_id, key in enumerate(self.fuzzy_keys):
+            grams = trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = np.array(sizes, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def search(self, query: str, limit: int = 8) -> List[dict]:
+        """Best-ranked cities with a word starting with query; the most popular ones for an empty query"""
+        prefix = fold(query)
+        if not prefix:
+            ranks = range(min(limit, len(self.items)))
+        elif len(prefix) <= PRECOMPUTED_PREFIX:
+            ranks = self.short.get(prefix, ())[:limit]
+        else:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\uffff", lo)
+            # A city can match on more than one word
+            ranks = heapq.nsmallest(limit, set(self.ranks[lo:hi]))
+        return [self.items[rank] for rank in ranks]
+
+    def resolve(self, text: str) -> Resolution:
+        name = " ".join(text.split())
+        if name in self.exact:
+            return Resolution(self.items[self.exact[name]], "exact", [])
+        key = squash(name)
+        if not key:
+            return Resolution(None, None, [])
+        for match, table in (("normalized", self.squashed), ("alias", self.aliases)):
+            ranks = table.get(key)
+            if ranks:
+                if len(ranks) == 1:
+                    return Resolution(self.items[ranks[0]], match, [])
+                return Resolution(None, None, [self.items[rank] for rank in ranks[:SUGGESTIONS]])
+        return self._resolve_fuzzy(key)
+
+    def _resolve_fuzzy(self, key: str) -> Resolution:
+        query_grams = trigrams(key)
+        grams = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if len(key) < 3 or not grams:
+            return Resolution(None, None, [])
+        # Trigrams shortlist the keys; edit similarity, which is steadier on short names, ranks them
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.fuzzy_keys))
+        dice = 2 * shared / (self.gram_counts + len(query_grams))
+        count = min(FUZZY_CANDIDATES, len(dice))
+        shortlist = np.argpartition(-dice, count - 1)[:count]
+
+        # Best score per city; a city's name and its aliases compete as one
+        best: Dict[int, float] = {}
+        matcher = SequenceMatcher(b=key, autojunk=False)
+        for key_id in shortlist:
+            if dice[key_id] < SHORTLIST_MIN_DICE:
+                continue
+            matcher.set_seq1(self.fuzzy_keys[key_id])
+            if matcher.quick_ratio() < SUGGESTION_MIN_SCORE:
+                continue
+            score = matcher.ratio()
+            for rank in self.fuzzy_ranks[key_id]:
+                best[rank] = max(best.get(rank, 0.0), score)
+        ordered = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        if not ordered:
+            return Resolution(None, None, [])
+        first_rank, first = ordered[0]
+        # A close runner-up blocks the match only if it ties or is better known: "Jaipr" is Jaipur, not Jaitpur
+        close = [(rank, score) for rank, score in ordered[1:] if first - score < RESOLVE_MIN_MARGIN]
+        if first >= RESOLVE_MIN_SCORE and all(score < first and rank > first_rank for rank, score in close):
+            return Resolution(self.items[first_rank], "fuzzy", [])
+        suggestions = [self.items[rank] for rank, score in ordered[:SUGGESTIONS] if score >= SUGGESTION_MIN_SCORE]
+        return Resolution(None, None, suggestions)
+
+
+# Popularity counts the last N itineraries (a primary-key range, not a scan of the whole table)
+CITY_POPULARITY_WINDOW = int(os.getenv("CITY_POPULARITY_WINDOW", "100000"))
+CITY_POPULARITY_REFRESH_SECONDS = int(os.getenv("CITY_POPULARITY_REFRESH_SECONDS", "3600"))
+
+_popularity: Dict[str, int] = {}
+
+
+def load_popularity(db):
+    """Itineraries per city among the most recent CITY_POPULARITY_WINDOW"""
+    global _popularity
+    newest = db.execute(select(func.max(models.Itinerary.id))).scalar() or 0
+    _popularity = dict(db.execute(
+        select(models.Itinerary.city, func.count())
+        .where(models.Itinerary.id > newest - CITY_POPULARITY_WINDOW)
+        .group_by(models.Itinerary.city)
+    ).all())
+
+
+def build(db) -> CityIndex:
+    # Only the cities table is read here; popularity and geonames data are loaded
+    # in the background by warm() and reused by every rebuild
+    cities = db.execute(select(models.City.id, models.City.name)).all()
+    return CityIndex(cities, _popularity, _populations, _alternates)
+
+
+_index: Optional[CityIndex] = None
+_index_lock = threading.Lock()
+
+
+def refresh(db=None) -> CityIndex:
+    """Rebuild from the database and swap the new index in; lookups keep using the old one meanwhile"""
+    global _index
+    # Serialized, so a rebuild never replaces one that saw more recent cities
+    with _index_lock:
+        if db is not None:
+            _index = build(db)
+        else:
+            db = SessionLocal()
+            try:
+                _index = build(db)
+            finally:
+                db.close()
+    return _index
+
+
+def get_index() -> CityIndex:
+    """Process-wide index, built on first use"""
+    if _index is None:
+        refresh()
+    return _index
+
+
+def _refresh_in_background():
+    load_geonames()
+    while True:
+        db = SessionLocal()
+        try:
+            load_popularity(db)
+            refresh(db)
+        except Exception as e:
+            print(f"⚠️ City index refresh failed: {e}")
+        finally:
+            db.close()
+        time.sleep(CITY_POPULARITY_REFRESH_SECONDS)
+
+
+_background: Optional[threading.Thread] = None
+
+
+def warm():
+    """Build the index from city names now; geonames data and popularity follow from a background thread"""
+    global _background
+    get_index()
+    if _background is None:
+        _background = threading.Thread(target=_refresh_in_background, name="city-index", daemon=True)
+        _background.start()
+
+
+def search(query: str, limit: int = 8) -> List[dict]:
+    return get_index().search(query, limit)
+
+
+def resolve(text: str) -> Resolution:
+    return get_index().resolve(text)
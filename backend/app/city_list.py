@@ -0,0 +1,124 @@
+"""
+Pre-serialized responses for the full city list.
+
+GET /api/cities/ and GET /api/itineraries/cities return the same JSON (id,
+name, country for every city, by name). Both used to query and validate every
+row on each request, although the list only changes when a city is added. Now
+the body is serialized once, gzipped once, and served as bytes with a strong
+ETag. A request whose If-None-Match matches gets an empty 304.
+
+crud.create_city drops the snapshot. Other worker processes pick the new city
+up when their snapshot expires (CITY_LIST_MAX_AGE_SECONDS). If nothing changed,
+a rebuilt snapshot has the same ETag, so clients keep getting 304s.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from . import models, schemas
+from .database import SessionLocal
+
+# How long a worker serves its snapshot before rereading the cities table
+CITY_LIST_MAX_AGE_SECONDS = int(os.getenv("CITY_LIST_MAX_AGE_SECONDS", "300"))
+CACHE_CONTROL = "no-cache"  # browsers may store the list but must revalidate it
+
+
+class Snapshot:
+    def __init__(self, cities: list):
+        self.body = json.dumps(cities, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Strong ETags name one representation, so the gzipped body gets its own
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.built_at = time.monotonic()
+        self.count = len(cities)
+
+    def fresh(self) -> bool:
+        return time.monotonic() - self.built_at < CITY_LIST_MAX_AGE_SECONDS
+
+
+_snapshot: Optional[Snapshot] = None
+# Bumped by invalidate(), so a build that raced with a new city isn't kept
+_generation = 0
+_lock = threading.Lock()
+
+
+def build() -> Snapshot:
+    # Read from the primary: a rebuild right after create_city must include the new city
+    db = SessionLocal()
+    try:
+        cities = db.execute(select(models.City).order_by(models.City.name)).scalars()
+        return Snapshot([schemas.CityOut.model_validate(c).model_dump() for c in cities])
+    finally:
+        db.close()
+
+
+def get_snapshot() -> Snapshot:
+    global _snapshot
+    # One rebuild at a time; requests that waited reuse its result
+    with _lock:
+        if _snapshot is not None and _snapshot.fresh():
+            return _snapshot
+        generation = _generation
+        snapshot = build()
+        if generation == _generation:
+            _snapshot = snapshot
+        return snapshot
+
+
+def invalidate():
+    global _snapshot, _generation
+    _generation += 1
+    _snapshot = None
+
+
+def not_modified(if_none_match: Optional[str], snapshot: Snapshot) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, and either encoding's tag names the same list
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or snapshot.etag in tags or snapshot.gzip_etag in tags
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if Accept-Encoding allows gzip: listed, or covered by "*", with a q-value above 0"""
+    qualities = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+
+async def respond(request: Request) -> Response:
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.fresh():
+        snapshot = await run_in_threadpool(get_snapshot)
+    headers = {"Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    headers["ETag"] = snapshot.gzip_etag if use_gzip else snapshot.etag
+    if not_modified(request.headers.get("if-none-match"), snapshot):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot.gzipped, media_type="application/json", headers=headers)
+    return Response(snapshot.body, media_type="application/json", headers=headers)
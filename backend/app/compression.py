@@ -0,0 +1,151 @@
+"""
+Compressed JSON storage for itinerary plans.
+
+CompressedJSON stores a value as a one-byte codec tag followed by the
+compressed UTF-8 JSON, in a binary column. It uses zstd when the zstandard
+package is installed, with an optional trained dictionary (PLAN_ZSTD_DICT),
+and zlib otherwise. Reads accept every tag, so the codec can change at any
+time. Reads also accept plain JSON text, so rows written before the column was
+compressed stay readable until migrate_plan_storage.py rewrites them.
+
+On PostgreSQL the column must be bytea before this code writes to it:
+existing json columns are converted by `migrate_plan_storage.py --convert-only`,
+and check_plan_column() stops the app from starting until that has run.
+"""
+import json
+import os
+import zlib
+from typing import Iterable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# zstd | zlib | none (none still writes bytes, tagged as uncompressed JSON)
+PLAN_COMPRESSION = os.getenv("PLAN_COMPRESSION", "zstd" if zstandard else "zlib")
+PLAN_COMPRESSION_LEVEL = int(os.getenv("PLAN_COMPRESSION_LEVEL", "6"))
+# zstd dictionary trained on existing plans (see migrate_plan_storage.py --train-dict)
+PLAN_ZSTD_DICT = os.getenv("PLAN_ZSTD_DICT")
+
+TAG_RAW = b"\x00"
+TAG_ZLIB = b"\x01"
+TAG_ZSTD = b"\x02"
+TAG_ZSTD_DICT = b"\x03"
+TAGS = (TAG_RAW, TAG_ZLIB, TAG_ZSTD, TAG_ZSTD_DICT)
+
+
+class Codec:
+    """Compressors built once per process; zstd contexts are reused across calls"""
+
+    def __init__(self, method: str = PLAN_COMPRESSION, level: int = PLAN_COMPRESSION_LEVEL,
+                 dict_path: Optional[str] = PLAN_ZSTD_DICT):
+        if method == "zstd" and zstandard is None:
+            print("⚠️ zstandard is not installed; compressing plans with zlib")
+            method = "zlib"
+        self.method = method
+        self.level = level
+        self.dictionary = None
+        if zstandard and dict_path:
+            with open(dict_path, "rb") as f:
+                self.dictionary = zstandard.ZstdCompressionDict(f.read())
+        if zstandard:
+            self._zstd_c = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+            self._zstd_d = zstandard.ZstdDecompressor()
+            self._zstd_dict_d = zstandard.ZstdDecompressor(dict_data=self.dictionary) if self.dictionary else None
+
+    def encode(self, value) -> bytes:
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.method == "zstd":
+            return (TAG_ZSTD_DICT if self.dictionary else TAG_ZSTD) + self._zstd_c.compress(raw)
+        if self.method == "zlib":
+            return TAG_ZLIB + zlib.compress(raw, self.level)
+        return TAG_RAW + raw
+
+    def decode(self, data):
+        if isinstance(data, (list, dict)):
+            # Already parsed by the driver (psycopg2 decodes json columns)
+            return data
+        if isinstance(data, str):
+            # Plain JSON text from before compression
+            return json.loads(data)
+        data = bytes(data)
+        tag, body = data[:1], data[1:]
+        if tag == TAG_ZLIB:
+            raw = zlib.decompress(body)
+        elif tag == TAG_ZSTD:
+            raw = self._decompressor(False).decompress(body)
+        elif tag == TAG_ZSTD_DICT:
+            raw = self._decompressor(True).decompress(body)
+        elif tag == TAG_RAW:
+            raw = body
+        else:
+            # Plain JSON bytes, e.g. a PostgreSQL json column converted to bytea
+            raw = data
+        return json.loads(raw)
+
+    def _decompressor(self, with_dict: bool):
+        if zstandard is None:
+            raise RuntimeError("Plan was stored with zstd; install zstandard to read it")
+        if with_dict and self._zstd_dict_d is None:
+            raise RuntimeError("Plan was stored with a zstd dictionary; set PLAN_ZSTD_DICT to read it")
+        return self._zstd_dict_d if with_dict else self._zstd_d
+
+
+_codec = None
+
+
+def get_codec() -> Codec:
+    global _codec
+    if _codec is None:
+        _codec = Codec()
+    return _codec
+
+
+def is_compressed(data) -> bool:
+    """True if data was written by CompressedJSON with the current codec settings"""
+    if isinstance(data, str) or not data:
+        return False
+    codec = get_codec()
+    expected = {"zstd": TAG_ZSTD_DICT if codec.dictionary else TAG_ZSTD, "zlib": TAG_ZLIB}.get(codec.method, TAG_RAW)
+    return bytes(data[:1]) == expected
+
+
+def train_dictionary(samples: Iterable, size: int = 16 * 1024) -> bytes:
+    """zstd dictionary trained on JSON values (a few hundred plans or more)"""
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary needs the zstandard package")
+    encoded = [json.dumps(s, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for s in samples]
+    return zstandard.train_dictionary(size, encoded).as_bytes()
+
+
+def plan_column_needs_conversion(engine) -> bool:
+    """True on PostgreSQL while itineraries.plan is still the old json column"""
+    if engine.dialect.name != "postgresql":
+        return False
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns("itineraries")}
+    return "plan" in columns and not isinstance(columns["plan"], LargeBinary)
+
+
+def check_plan_column(engine):
+    """Refuse to start against an unconverted column; every insert would fail"""
+    if plan_column_needs_conversion(engine):
+        raise RuntimeError(
+            "itineraries.plan is still a json column. Stop the app and run "
+            "`python migrate_plan_storage.py --convert-only` before starting this version."
+        )
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON value stored compressed in a binary column"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else get_codec().encode(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else get_codec().decode(value)
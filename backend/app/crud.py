@@ -1,21 +1,35 @@
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from .auth import hash_password, verify_password, create_access_token
 from .models import User
 from fastapi import HTTPException
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
 import os
+import time
 import json
-from . import models, schemas
+from . import models, schemas, result_cache, telemetry, poi_catalog, budget_optimizer, city_index, city_list
+from .model_health import model_health, classify_error
+from .stream_parser import JsonArrayStreamParser
 
-# NEW: Import google.genai
-from google import genai
-
-# Configure client
+# Configure client (built by init_gemini_client at startup)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 gemini_client = None
 
-if GEMINI_API_KEY:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+
+def init_gemini_client():
+    """Create the Gemini client if a key is set; the google.genai import alone takes about half a second"""
+    global gemini_client
+    if gemini_client is None and GEMINI_API_KEY:
+        from google import genai
+        gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+    return gemini_client
 
 
 # -------- City --------
@@ -36,78 +50,175 @@ def create_city(db: Session, city: schemas.CityCreate) -> models.City:
     db.add(db_city)
     db.commit()
     db.refresh(db_city)
+    city_index.refresh(db)
+    city_list.invalidate()
     return db_city
 
 
 # -------- Itinerary --------
-def create_itinerary(db: Session, itinerary_in: schemas.ItineraryRequest, user_id: int):
-    """Create a budget-aware itinerary using Gemini AI"""
-    
-    # 1. Find City
-    city = db.query(models.City).filter(models.City.name == itinerary_in.city).first()
-    if not city:
-        raise HTTPException(
-            status_code=404, 
-            detail=f"City '{itinerary_in.city}' not found."
-        )
+BUDGET_MULTIPLIERS = {
+    "budget": {"accommodation": 0.25, "food": 0.30, "activities": 0.30, "transport": 0.15},
+    "mid-range": {"accommodation": 0.35, "food": 0.25, "activities": 0.25, "transport": 0.15},
+    "luxury": {"accommodation": 0.45, "food": 0.25, "activities": 0.20, "transport": 0.10},
+}
+
+# Models tried in order until one returns a usable plan
+GEMINI_MODELS = [
+    'gemini-2.5-flash',           # Newest
+    'gemini-2.0-flash-lite',      # Lighter quota
+    'gemini-2.5-flash-lite',      # Even lighter
+    'gemini-flash-lite-latest',   # Fallback
+    'gemini-2.0-flash',           # Try last (quota issues)
+]
+
+# Cap on concurrent in-flight Gemini calls per worker process (each hedge is a call)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+# Hard cap on time spent waiting for Gemini (queueing for a slot included) before using the local fallback
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "30"))
+
+
+class GeminiSlotTimeout(Exception):
+    """No GEMINI_MAX_CONCURRENCY slot freed up before the deadline"""
+
+
+@asynccontextmanager
+async def gemini_slot(deadline: float):
+    """Hold one of the GEMINI_MAX_CONCURRENCY slots; yields False if none frees up before deadline (loop time)"""
+    remaining = max(deadline - asyncio.get_running_loop().time(), 0)
+    try:
+        await asyncio.wait_for(_gemini_semaphore.acquire(), remaining)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Gemini deadline of {GEMINI_DEADLINE_SECONDS}s reached while queued for a slot")
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        _gemini_semaphore.release()
+
+# How long a model may stay silent before the next one is started in parallel
+GEMINI_HEDGE_DELAY_SECONDS = float(os.getenv("GEMINI_HEDGE_DELAY_SECONDS", "8"))
+# Also store each day as an itinerary_days row; false keeps only the plan JSON
+ITINERARY_DAY_ROWS = os.getenv("ITINERARY_DAY_ROWS", "true").lower() == "true"
+
+
+def get_city_or_404(db: Session, name: str) -> models.City:
+    city = db.query(models.City).filter(models.City.name == name).first()
+    if city:
+        return city
+    # "Bangalore", "Bombay", "Jaipr", stray spaces: map to the city the user meant
+    resolution = city_index.resolve(name)
+    if resolution.city:
+        city = db.get(models.City, resolution.city["id"])
+        if city:
+            return city
+    detail = f"City '{name}' not found."
+    if resolution.suggestions:
+        detail += f" Did you mean: {', '.join(s['name'] for s in resolution.suggestions)}?"
+    raise HTTPException(
+        status_code=404, 
+        detail=detail
+    )
 
-    # 2. Calculate Budget
+
+def calculate_budget(itinerary_in: schemas.ItineraryRequest) -> dict:
+    """Split the total budget into per-day allocations for the travel style"""
     total_budget = itinerary_in.budget
     days = itinerary_in.days
     daily_budget = total_budget // days if days > 0 else total_budget
-    
-    budget_multipliers = {
-        "budget": {"accommodation": 0.25, "food": 0.30, "activities": 0.30, "transport": 0.15},
-        "mid-range": {"accommodation": 0.35, "food": 0.25, "activities": 0.25, "transport": 0.15},
-        "luxury": {"accommodation": 0.45, "food": 0.25, "activities": 0.20, "transport": 0.10},
-    }
-    
+
     style = (itinerary_in.travelStyle or "mid-range").lower()
-    allocation = budget_multipliers.get(style, budget_multipliers["mid-range"])
-    
-    daily_food = int(daily_budget * allocation["food"])
-    daily_activities = int(daily_budget * allocation["activities"])
-    daily_transport = int(daily_budget * allocation["transport"])
+    allocation = BUDGET_MULTIPLIERS.get(style, BUDGET_MULTIPLIERS["mid-range"])
+
+    return {
+        "total_budget": total_budget,
+        "daily_budget": daily_budget,
+        "daily_food": int(daily_budget * allocation["food"]),
+        "daily_activities": int(daily_budget * allocation["activities"]),
+        "daily_transport": int(daily_budget * allocation["transport"]),
+    }
+
 
+def build_ai_kwargs(city: models.City, itinerary_in: schemas.ItineraryRequest, budget: dict) -> dict:
     interests_str = ", ".join(itinerary_in.interests) if itinerary_in.interests else "general sightseeing"
+    return {
+        "city_name": city.name,
+        "days": itinerary_in.days,
+        "total_budget": budget["total_budget"],
+        "daily_budget": budget["daily_budget"],
+        "daily_food": budget["daily_food"],
+        "daily_activities": budget["daily_activities"],
+        "daily_transport": budget["daily_transport"],
+        "travel_style": itinerary_in.travelStyle or schemas.DEFAULT_TRAVEL_STYLE,
+        "interests_str": interests_str,
+        "transport_mode": itinerary_in.transportMode or schemas.DEFAULT_TRANSPORT_MODE,
+    }
 
-    # 3. Try Gemini AI
-    ai_data = None
-    
-    if gemini_client:
-        ai_data = call_gemini_ai(
-            city_name=city.name,
-            days=days,
-            total_budget=total_budget,
-            daily_budget=daily_budget,
-            daily_food=daily_food,
-            daily_activities=daily_activities,
-            daily_transport=daily_transport,
-            travel_style=itinerary_in.travelStyle or "mid-range",
-            interests_str=interests_str,
-            transport_mode=itinerary_in.transportMode or "public transport"
-        )
 
-    # 4. Use fallback if AI failed
-    if not ai_data:
-        print("⚠️ Using enhanced fallback")
-        ai_data = get_city_specific_fallback(
-            city_name=city.name,
-            days=days,
-            daily_budget=daily_budget,
-            daily_food=daily_food,
-            daily_activities=daily_activities,
-            daily_transport=daily_transport,
-            interests=itinerary_in.interests or ["sightseeing"],
-            transport_mode=itinerary_in.transportMode or "Metro"
-        )
+def local_plan_kwargs(city: models.City, itinerary_in: schemas.ItineraryRequest, budget: dict) -> dict:
+    return {
+        "city_name": city.name,
+        "days": itinerary_in.days,
+        "daily_budget": budget["daily_budget"],
+        "daily_food": budget["daily_food"],
+        "daily_activities": budget["daily_activities"],
+        "daily_transport": budget["daily_transport"],
+        "interests": itinerary_in.interests or ["sightseeing"],
+        "transport_mode": itinerary_in.transportMode or "Metro",
+    }
+
+
+def build_fallback_plan(city: models.City, itinerary_in: schemas.ItineraryRequest, budget: dict) -> list:
+    print("⚠️ Using enhanced fallback")
+    return get_city_specific_fallback(**local_plan_kwargs(city, itinerary_in, budget))
+
+
+def daily_limit(budget: dict) -> int:
+    """Per-day spend the plan text may add up to (accommodation is budgeted separately)"""
+    return budget["daily_food"] + budget["daily_activities"] + budget["daily_transport"]
 
-    # 5. Save to Database
+
+def enforce_budget(plan: list, city: models.City, itinerary_in: schemas.ItineraryRequest, budget: dict) -> list:
+    """Replace days whose summed ₹ costs go over the daily allocation with optimized local days"""
+    over = budget_optimizer.over_budget_days(plan, daily_limit(budget))
+    if not over:
+        return plan
+
+    print(f"⚠️ {len(over)} day(s) over budget; replacing with local plan")
+    telemetry.record_budget_repair(len(over))
+    # Avoid places the kept AI days already visit
+    kept_text = " ".join(
+        str(day.get(slot, "")) for i, day in enumerate(plan) if i not in over
+        for slot in ("morning", "afternoon", "evening")
+    )
+    local = get_city_specific_fallback(**local_plan_kwargs(city, itinerary_in, budget), exclude_text=kept_text)
+    repaired = list(plan)
+    for i in over:
+        number = plan[i].get("day") or i + 1
+        repaired[i] = {**local[(number - 1) % len(local)], "day": number}
+    return repaired
+
+
+def save_itinerary(
+    db: Session,
+    itinerary_in: schemas.ItineraryRequest,
+    city: models.City,
+    ai_data: list,
+    user_id: int,
+    idempotency_key: Optional[str] = None,
+    request_hash: Optional[str] = None
+) -> models.Itinerary:
+    """
+    Store the itinerary, its idempotency key and its day rows in one transaction.
+    The itinerary insert and the multi-row day insert both use RETURNING, so
+    nothing is re-read after the commit.
+    """
     db_itinerary = models.Itinerary(
         user_id=user_id,
         city=city.name,
-        days=days,
-        budget=total_budget,
+        days=itinerary_in.days,
+        budget=itinerary_in.budget,
         travel_style=itinerary_in.travelStyle,
         accommodation=itinerary_in.accommodation,
         pace=itinerary_in.pace,
@@ -116,25 +227,95 @@ def create_itinerary(db: Session, itinerary_in: schemas.ItineraryRequest, user_i
         plan=ai_data
     )
     db.add(db_itinerary)
-    db.commit()
-    db.refresh(db_itinerary)
-
-    # 6. Save Days
-    for day in ai_data:
-        db.add(models.ItineraryDay(
-            itinerary_id=db_itinerary.id,
-            day_number=day.get('day', 1),
-            morning=day.get('morning', ''),
-            afternoon=day.get('afternoon', ''),
-            evening=day.get('evening', '')
+    db.flush()
+    if idempotency_key:
+        # Same transaction, so a racing retry can't create a second row
+        db.add(models.IdempotencyKey(
+            user_id=user_id,
+            key=idempotency_key,
+            request_hash=request_hash,
+            itinerary_id=db_itinerary.id
         ))
-    
-    db.commit()
-    db.refresh(db_itinerary)
+
+    day_plans = []
+    if ITINERARY_DAY_ROWS and ai_data:
+        day_plans = db.scalars(
+            insert(models.ItineraryDay).returning(models.ItineraryDay),
+            [
+                {
+                    "itinerary_id": db_itinerary.id,
+                    "day_number": day.get('day', 1),
+                    "morning": day.get('morning', ''),
+                    "afternoon": day.get('afternoon', ''),
+                    "evening": day.get('evening', ''),
+                }
+                for day in ai_data
+            ]
+        ).all()
+    # Without day rows, ItineraryOut derives day_plans from the plan JSON
+    set_committed_value(db_itinerary, "day_plans", list(day_plans))
+
+    # Everything the response needs is in memory already; don't expire it on commit
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = get_idempotent_itinerary(db, user_id, idempotency_key, request_hash) if idempotency_key else None
+        if existing:
+            return existing
+        raise
+    finally:
+        db.expire_on_commit = expire_on_commit
     return db_itinerary
 
 
-def call_gemini_ai(
+# -------- Idempotency --------
+def hash_request(itinerary_in: schemas.ItineraryRequest) -> str:
+    raw = json.dumps(itinerary_in.model_dump(), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_idempotent_itinerary(
+    db: Session, user_id: int, idempotency_key: str, request_hash: str
+) -> Optional[models.Itinerary]:
+    record = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key == idempotency_key
+    ).first()
+    if not record:
+        return None
+    if record.request_hash != request_hash:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency-Key was already used with a different request."
+        )
+    return record.itinerary
+
+
+def prepare_create(
+    db: Session,
+    itinerary_in: schemas.ItineraryRequest,
+    user_id: int,
+    idempotency_key: Optional[str],
+    request_hash: str
+):
+    if idempotency_key:
+        existing = get_idempotent_itinerary(db, user_id, idempotency_key, request_hash)
+        if existing:
+            return schemas.ItineraryOut.model_validate(existing), None, None, None
+
+    city = get_city_or_404(db, itinerary_in.city)
+    cache_key = result_cache.make_cache_key(itinerary_in, city.name)
+    cached = result_cache.get_cached_plan(db, cache_key)
+    # Detach the city and end the read transaction so the pooled connection
+    # isn't held for the whole LLM call
+    db.expunge(city)
+    db.rollback()
+    return None, city, cache_key, cached
+
+
+def build_itinerary_prompt(
     city_name: str,
     days: int,
     total_budget: int,
@@ -144,92 +325,406 @@ def call_gemini_ai(
     daily_transport: int,
     travel_style: str,
     interests_str: str,
-    transport_mode: str
+    transport_mode: str,
+    day_start: int = 1,
+    day_end: Optional[int] = None,
+    assigned_attractions: Optional[List[str]] = None
+) -> str:
+    day_end = day_end or days
+    if day_start == 1 and day_end == days:
+        scope = f"Create a {days}-day trip to {city_name}."
+        count = f"Exactly {days} days."
+    else:
+        scope = f"Plan days {day_start} to {day_end} of a {days}-day trip to {city_name}."
+        count = f"Exactly {day_end - day_start + 1} days, numbered {day_start} to {day_end}."
+    if assigned_attractions:
+        # Other chunks of the same trip were given different attractions
+        scope += f" Visit ONLY these attractions (others are covered on other days): {', '.join(assigned_attractions)}."
+
+    if daily_budget < 1000:
+        tier = "Prefer street food and free attractions."
+    elif daily_budget < 3000:
+        tier = "Prefer affordable restaurants and popular spots."
+    else:
+        tier = "Prefer good restaurants and premium experiences."
+
+    # The number enforce_budget checks (daily_limit): daily_budget minus accommodation
+    day_limit = daily_food + daily_activities + daily_transport
+
+    # Kept short: the JSON shape is enforced by response_schema, not described here
+    return f"""Expert India travel planner. {scope}
+Budget ₹: total {total_budget}. Each day's listed costs must total at most ₹{day_limit} (food {daily_food}, activities {daily_activities}, transport {daily_transport}), excluding accommodation, which is budgeted separately: don't list hotel costs.
+Style: {travel_style}. Interests: {interests_str}. Transport: {transport_mode}.
+Use real, named places in {city_name}. {tier}
+Each of morning/afternoon/evening: times, places and ₹ cost for every meal and activity, ending with "| Travel: ₹XX".
+{count}"""
+
+
+# Compiled once; validating every reply against these replaces ad-hoc json.loads checks
+DAY_LIST_ADAPTER = TypeAdapter(List[schemas.AIDayPlan])
+NAME_LIST_ADAPTER = TypeAdapter(List[str])
+
+
+def json_config(response_schema=list[schemas.AIDayPlan], **extra):
+    """
+    Ask Gemini for JSON matching response_schema instead of free text.
+    Use builtin list[...] here: the config model silently drops typing.List[...] schemas.
+    """
+    from google.genai import types
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=response_schema,
+        **extra
+    )
+
+
+def parse_ai_response(text: str, adapter: TypeAdapter = DAY_LIST_ADAPTER) -> Optional[list]:
+    """Validate the reply against adapter; raises pydantic.ValidationError on a bad reply"""
+    text = (text or "").strip()
+    try:
+        data = adapter.validate_json(text)
+    except ValidationError:
+        # Schema-constrained replies are bare JSON; tolerate a stray markdown fence anyway
+        if "```" not in text:
+            raise
+        clean_text = text.split("```json")[1] if "```json" in text else text.split("```")[1]
+        data = adapter.validate_json(clean_text.split("```")[0].strip())
+    return adapter.dump_python(data) or None
+
+
+def log_model_error(model_name: str, e: Exception):
+    kind = classify_error(e)
+    if kind == "invalid_output":
+        print(f"❌ {model_name} - Invalid JSON: {str(e).splitlines()[0][:80]}")
+    elif kind == "quota":
+        print(f"⚠️ {model_name} - Quota exhausted, trying next...")
+    elif kind == "not_found":
+        print(f"❌ {model_name} - Not found, trying next...")
+    else:
+        print(f"❌ {model_name} - Error: {str(e)[:60]}")
+
+
+def handle_model_error(model_name: str, e: Exception):
+    log_model_error(model_name, e)
+    model_health.record_failure(model_name, e)
+
+
+async def _generate_with_model(model_name: str, prompt: str, response_schema, adapter: TypeAdapter) -> list:
+    """One async generation attempt; raises on any failure so callers can move on"""
+    start = time.perf_counter()
+    response = None
+    try:
+        response = await gemini_client.aio.models.generate_content(
+            model=model_name,
+            contents=prompt,
+            config=json_config(response_schema)
+        )
+        ai_data = parse_ai_response(response.text, adapter)
+        if not ai_data:
+            raise ValueError("empty plan")
+    except asyncio.CancelledError:
+        telemetry.record_gemini_call(model_name, time.perf_counter() - start, "cancelled")
+        raise
+    except Exception as e:
+        telemetry.record_gemini_call(
+            model_name, time.perf_counter() - start, classify_error(e), getattr(response, "usage_metadata", None)
+        )
+        raise
+    telemetry.record_gemini_call(
+        model_name, time.perf_counter() - start, "success", getattr(response, "usage_metadata", None)
+    )
+    return ai_data
+
+
+async def call_gemini_ai_async(deadline: Optional[float] = None, **prompt_kwargs) -> Optional[list]:
+    """Itinerary prompt through generate_json_async"""
+    return await generate_json_async(build_itinerary_prompt(**prompt_kwargs), deadline=deadline)
+
+
+async def generate_json_async(
+    prompt: str,
+    response_schema=list[schemas.AIDayPlan],
+    adapter: TypeAdapter = DAY_LIST_ADAPTER,
+    deadline: Optional[float] = None
 ) -> Optional[list]:
-    """Call Gemini AI using available models"""
-    
+    """
+    Hedged Gemini call returning a non-empty list validated by adapter.
+    Each model call, hedges included, holds one GEMINI_MAX_CONCURRENCY slot.
+
+    Models start in GEMINI_MODELS order. A model that fails is replaced right
+    away. If the running models haven't answered within GEMINI_HEDGE_DELAY_SECONDS,
+    the next one starts in parallel. The first valid plan wins, and the other
+    calls are cancelled. After GEMINI_DEADLINE_SECONDS (or at deadline, in loop
+    time, when one request makes several calls) everything is cancelled and
+    None is returned, so the caller falls back to the local planner.
+    """
+
     if not gemini_client:
         print("❌ Gemini client not initialized")
         return None
-    
-    # UPDATED: Use models that are actually available
-    models_to_try = [
-        'gemini-2.5-flash',           # Newest
-        'gemini-2.0-flash-lite',      # Lighter quota
-        'gemini-2.5-flash-lite',      # Even lighter
-        'gemini-flash-lite-latest',   # Fallback
-        'gemini-2.0-flash',           # Try last (quota issues)
-    ]
-    
-    prompt = f"""
-You are an expert travel planner for India. Create a {days}-day trip to {city_name}.
-
-BUDGET (STRICTLY FOLLOW):
-- Total: ₹{total_budget}
-- Per Day: ₹{daily_budget}
-- Food/day: ₹{daily_food}
-- Activities/day: ₹{daily_activities}
-- Transport/day: ₹{daily_transport}
-
-PREFERENCES:
-- Style: {travel_style}
-- Interests: {interests_str}
-- Transport: {transport_mode}
-
-RULES:
-1. Use REAL places in {city_name} (real restaurants, real monuments)
-2. Include ₹ cost for EVERY activity and meal
-3. Stay within daily budget of ₹{daily_budget}
-4. {"Suggest street food, free attractions, budget stays" if daily_budget < 1000 else "Suggest affordable restaurants, popular spots" if daily_budget < 3000 else "Suggest good restaurants, premium experiences"}
-
-OUTPUT: Return ONLY valid JSON array, no markdown:
-[
-  {{"day": 1, "morning": "8 AM - Breakfast at [Place] (₹XX) → 10 AM - Visit [Place] (₹XX) | Travel: ₹XX", "afternoon": "1 PM - Lunch at [Place] (₹XX) → 3 PM - [Activity] (₹XX) | Travel: ₹XX", "evening": "7 PM - Dinner at [Place] (₹XX) → [Activity] | Travel: ₹XX"}}
-]
 
-Generate exactly {days} days.
-"""
-
-    for model_name in models_to_try:
-        try:
-            print(f"🔄 Trying {model_name}...")
-            
-            response = gemini_client.models.generate_content(
-                model=model_name,
-                contents=prompt
-            )
-            
-            clean_text = response.text.strip()
-            
-            # Remove markdown
-            if "```json" in clean_text:
-                clean_text = clean_text.split("```json")[1].split("```")[0]
-            elif "```" in clean_text:
-                clean_text = clean_text.split("```")[1].split("```")[0]
-            
-            ai_data = json.loads(clean_text.strip())
-            
-            if isinstance(ai_data, list) and len(ai_data) > 0:
-                print(f"✅ AI generated {len(ai_data)} days using {model_name}")
+    loop = asyncio.get_running_loop()
+    # Started before queueing, so time spent waiting for a slot counts too
+    if deadline is None:
+        deadline = loop.time() + GEMINI_DEADLINE_SECONDS
+    models_left = list(GEMINI_MODELS)
+    pending = {}
+    # When each call got its slot and actually went out to Gemini
+    sent_at = {}
+    timed_out = False
+
+    async def generate_in_slot(model_name: str):
+        # One slot per call, hedges included, so GEMINI_MAX_CONCURRENCY caps calls in flight
+        async with gemini_slot(deadline) as acquired:
+            if not acquired:
+                raise GeminiSlotTimeout()
+            sent_at[model_name] = loop.time()
+            return await _generate_with_model(model_name, prompt, response_schema, adapter)
+
+    def launch_next():
+        # Skip models whose breaker is open instead of paying for a failed round trip
+        while models_left:
+            model_name = models_left.pop(0)
+            if model_health.try_acquire(model_name):
+                print(f"🔄 Trying {model_name}...")
+                pending[asyncio.ensure_future(generate_in_slot(model_name))] = model_name
+                return
+
+    launch_next()
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                print(f"⏱️ Gemini deadline of {GEMINI_DEADLINE_SECONDS}s reached")
+                timed_out = True
+                return None
+
+            wait_for = min(GEMINI_HEDGE_DELAY_SECONDS, remaining) if models_left else remaining
+            done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if models_left:
+                    print(f"⏳ No answer after {GEMINI_HEDGE_DELAY_SECONDS}s, hedging...")
+                    launch_next()
+                continue
+
+            for task in done:
+                model_name = pending.pop(task)
+                try:
+                    ai_data = task.result()
+                except GeminiSlotTimeout:
+                    # Never reached the model; says nothing about its health
+                    model_health.release(model_name)
+                    continue
+                except Exception as e:
+                    handle_model_error(model_name, e)
+                    continue
+                model_health.record_success(model_name)
+                print(f"✅ AI generated {len(ai_data)} items using {model_name}")
                 return ai_data
-                
-        except json.JSONDecodeError as e:
-            print(f"❌ {model_name} - JSON Error: {e}")
-            continue
-        except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg:
-                print(f"⚠️ {model_name} - Quota exhausted, trying next...")
-            elif "404" in error_msg:
-                print(f"❌ {model_name} - Not found, trying next...")
+
+            if not pending and models_left:
+                launch_next()
+    finally:
+        # Cancel the losing (or timed-out) calls. One that ran into the deadline, or
+        # stayed silent past the hedge delay, counts as a failure like a timeout on
+        # the stream path; a hedge that merely lost the race (or never got a slot) doesn't.
+        now = loop.time()
+        for task, model_name in pending.items():
+            task.cancel()
+            sent = sent_at.get(model_name)
+            if sent is not None and (timed_out or now - sent >= GEMINI_HEDGE_DELAY_SECONDS):
+                model_health.record_failure(model_name, TimeoutError(f"no answer after {now - sent:.1f}s"))
             else:
-                print(f"❌ {model_name} - Error: {error_msg[:60]}")
-            continue
-    
+                model_health.release(model_name)
+
     print("❌ All Gemini models failed")
     return None
 
 
+# -------- Chunked generation for long trips --------
+# Trips at least this long are split into day ranges generated in parallel
+CHUNK_MIN_DAYS = int(os.getenv("CHUNK_MIN_DAYS", "8"))
+CHUNK_DAYS = int(os.getenv("CHUNK_DAYS", "5"))
+# Extra attempts for a failed chunk before its days go to the local planner
+CHUNK_RETRIES = int(os.getenv("CHUNK_RETRIES", "1"))
+
+
+def split_day_ranges(days: int, size: int) -> List[tuple]:
+    return [(start, min(start + size - 1, days)) for start in range(1, days + 1, size)]
+
+
+async def outline_attractions_async(
+    city_name: str, count: int, interests_str: str, deadline: Optional[float] = None
+) -> List[str]:
+    """Short up-front call listing distinct attractions, so parallel chunks can be given disjoint sets"""
+    prompt = (
+        f"List {count} distinct real attractions in {city_name}, India for a traveller interested in "
+        f"{interests_str}."
+    )
+    names = await generate_json_async(prompt, list[str], NAME_LIST_ADAPTER, deadline) or []
+    unique = []
+    for name in names:
+        if isinstance(name, str) and name.strip() and name.strip() not in unique:
+            unique.append(name.strip())
+    return unique
+
+
+def number_days(plan: list, day_start: int, day_end: int) -> list:
+    """Drop non-day items and extras, and number days ourselves rather than trusting the model"""
+    days = [day for day in plan if isinstance(day, dict)][:day_end - day_start + 1]
+    for offset, day in enumerate(days):
+        day["day"] = day_start + offset
+    return days
+
+
+async def _generate_chunk(
+    ai_kwargs: dict, day_start: int, day_end: int, attractions: List[str], deadline: float
+) -> Optional[list]:
+    loop = asyncio.get_running_loop()
+    for attempt in range(1 + CHUNK_RETRIES):
+        if attempt and loop.time() >= deadline:
+            # A retry would only be cancelled straight away
+            break
+        chunk = await call_gemini_ai_async(
+            deadline, **ai_kwargs, day_start=day_start, day_end=day_end, assigned_attractions=attractions
+        )
+        chunk = number_days(chunk or [], day_start, day_end)
+        if chunk:
+            return chunk
+        print(f"⚠️ Days {day_start}-{day_end} failed (attempt {attempt + 1})")
+    return None
+
+
+async def generate_plan_async(**ai_kwargs) -> Optional[list]:
+    """
+    Generate the day list for a trip. Long trips are split into CHUNK_DAYS ranges
+    that share the budget and interest context and run concurrently. Each range
+    gets its own slice of an up-front attraction outline, so places aren't
+    repeated across chunks. A failed chunk is retried on its own; if it still
+    fails its days are left out, and fill_missing_days completes the plan.
+    The outline, every chunk and every retry share one GEMINI_DEADLINE_SECONDS.
+    """
+    days = ai_kwargs["days"]
+    deadline = asyncio.get_running_loop().time() + GEMINI_DEADLINE_SECONDS
+    if days < CHUNK_MIN_DAYS:
+        return number_days(await call_gemini_ai_async(deadline, **ai_kwargs) or [], 1, days) or None
+
+    ranges = split_day_ranges(days, CHUNK_DAYS)
+    attractions = await outline_attractions_async(
+        ai_kwargs["city_name"], days * 2, ai_kwargs["interests_str"], deadline
+    )
+    per_chunk = -(-len(attractions) // len(ranges)) if attractions else 0
+    print(f"🧩 Generating {days} days in {len(ranges)} chunks ({len(attractions)} outlined attractions)")
+
+    chunks = await asyncio.gather(*[
+        _generate_chunk(ai_kwargs, start, end, attractions[i * per_chunk:(i + 1) * per_chunk], deadline)
+        for i, (start, end) in enumerate(ranges)
+    ])
+    plan = [day for chunk in chunks if chunk for day in chunk]
+    return plan or None
+
+
+def is_complete_plan(plan: Optional[list], days: int) -> bool:
+    return bool(plan) and {day.get("day") for day in plan} >= set(range(1, days + 1))
+
+
+def fill_missing_days(plan: list, fallback_plan: list, days: int) -> list:
+    """Merge into one ordered plan, taking any day the AI didn't produce from the local fallback"""
+    by_day = {day.get("day"): day for day in plan}
+    fallback_by_day = {day["day"]: day for day in fallback_plan}
+    return [by_day.get(number) or fallback_by_day[number] for number in range(1, days + 1)]
+
+
+# -------- Streaming --------
+async def stream_gemini_days(**prompt_kwargs):
+    """
+    Yield day objects as soon as each one closes in Gemini's streamed reply.
+
+    Models are tried in order (skipping open breakers) until one produces at
+    least one day. If a model fails part-way, the days already yielded stand and
+    the caller fills in the rest. Streams aren't hedged; GEMINI_DEADLINE_SECONDS
+    still bounds the whole call. Days are numbered and cut off like number_days.
+    """
+    if not gemini_client:
+        print("❌ Gemini client not initialized")
+        return
+
+    prompt = build_itinerary_prompt(**prompt_kwargs)
+    day_start = prompt_kwargs.get("day_start", 1)
+    wanted = (prompt_kwargs.get("day_end") or prompt_kwargs["days"]) - day_start + 1
+
+    loop = asyncio.get_running_loop()
+    # Started before queueing, so time spent waiting for a slot counts too
+    deadline = loop.time() + GEMINI_DEADLINE_SECONDS
+    async with gemini_slot(deadline) as acquired:
+        if not acquired:
+            return
+
+        for model_name in GEMINI_MODELS:
+            if loop.time() >= deadline:
+                print(f"⏱️ Gemini deadline of {GEMINI_DEADLINE_SECONDS}s reached")
+                return
+            if not model_health.try_acquire(model_name):
+                continue
+
+            parser = JsonArrayStreamParser()
+            emitted = 0
+            settled = False
+            usage = None
+            start = time.perf_counter()
+            try:
+                print(f"🔄 Streaming {model_name}...")
+                stream = await asyncio.wait_for(
+                    gemini_client.aio.models.generate_content_stream(
+                        model=model_name, contents=prompt, config=json_config()
+                    ),
+                    deadline - loop.time()
+                )
+                chunks = stream.__aiter__()
+                while emitted < wanted:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    # Token counts arrive on the last chunk
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    for day in parser.feed(chunk.text):
+                        if not isinstance(day, dict):
+                            continue
+                        # Number days ourselves rather than trusting the model, as number_days does
+                        day = schemas.AIDayPlan.model_validate({**day, "day": day_start + emitted}).model_dump()
+                        emitted += 1
+                        yield day
+                        if emitted >= wanted:
+                            break
+                if emitted >= wanted and hasattr(chunks, "aclose"):
+                    # Extra days past the trip: stop reading the reply
+                    await chunks.aclose()
+
+                if not emitted:
+                    raise ValueError("empty plan")
+                settled = True
+                model_health.record_success(model_name)
+                telemetry.record_gemini_call(model_name, time.perf_counter() - start, "success", usage)
+                print(f"✅ AI streamed {emitted} days using {model_name}")
+                return
+
+            except Exception as e:
+                settled = True
+                telemetry.record_gemini_call(model_name, time.perf_counter() - start, classify_error(e), usage)
+                handle_model_error(model_name, e)
+                if emitted:
+                    return
+            finally:
+                if not settled:
+                    # Client went away mid-stream
+                    model_health.release(model_name)
+                    telemetry.record_gemini_call(model_name, time.perf_counter() - start, "cancelled", usage)
+
+    print("❌ All Gemini models failed")
+
+
 def get_city_specific_fallback(
     city_name: str,
     days: int,
@@ -238,115 +733,73 @@ def get_city_specific_fallback(
     daily_activities: int,
     daily_transport: int,
     interests: List[str],
-    transport_mode: str
+    transport_mode: str,
+    exclude_text: str = ""
 ) -> list:
-    """Enhanced fallback with real places for major Indian cities"""
-    
-    city_places = {
-        "Delhi": {
-            "attractions": [
-                ("Red Fort", 50), ("Qutub Minar", 40), ("India Gate", 0),
-                ("Humayun's Tomb", 40), ("Lotus Temple", 0), ("Akshardham", 0),
-                ("Jama Masjid", 0), ("Chandni Chowk", 0), ("Connaught Place", 0),
-                ("National Museum", 20), ("Lodhi Garden", 0), ("Hauz Khas Village", 0)
-            ],
-            "food_budget": [
-                ("Paranthe Wali Gali", 100), ("Street food Chandni Chowk", 80),
-                ("Haldiram's", 150), ("Andhra Bhawan Canteen", 100)
-            ],
-            "food_mid": [
-                ("Karim's", 300), ("Moti Mahal", 400), ("Sagar Ratna", 250),
-                ("Rajdhani Thali", 350), ("Saravana Bhavan", 200)
-            ]
-        },
-        "Mumbai": {
-            "attractions": [
-                ("Gateway of India", 0), ("Marine Drive", 0), ("Elephanta Caves", 60),
-                ("Siddhivinayak Temple", 0), ("Juhu Beach", 0), ("Haji Ali", 0),
-                ("CST Station", 0), ("Colaba Causeway", 0)
-            ],
-            "food_budget": [
-                ("Street food Juhu Beach", 100), ("Cafe Madras", 150),
-                ("Ram Ashraya", 120), ("Swati Snacks", 200)
-            ],
-            "food_mid": [
-                ("Bademiya", 300), ("Britannia & Co", 400), ("Leopold Cafe", 350)
-            ]
-        },
-        "Jaipur": {
-            "attractions": [
-                ("Hawa Mahal", 50), ("Amber Fort", 200), ("City Palace", 150),
-                ("Jantar Mantar", 50), ("Nahargarh Fort", 50), ("Jal Mahal", 0)
-            ],
-            "food_budget": [
-                ("LMB", 120), ("Rawat Kachori", 80), ("Street food Johari Bazaar", 100)
-            ],
-            "food_mid": [
-                ("Chokhi Dhani", 600), ("Niros", 400), ("Handi Restaurant", 350)
-            ]
-        },
-        "Bangalore": {
-            "attractions": [
-                ("Lalbagh Garden", 20), ("Cubbon Park", 0), ("ISKCON Temple", 0),
-                ("Bangalore Palace", 250), ("Commercial Street", 0)
-            ],
-            "food_budget": [
-                ("Vidyarthi Bhavan", 100), ("MTR", 150), ("Brahmin's Coffee Bar", 80)
-            ],
-            "food_mid": [
-                ("Nagarjuna", 300), ("Empire Restaurant", 350), ("Truffles", 400)
-            ]
-        },
-        "Goa": {
-            "attractions": [
-                ("Baga Beach", 0), ("Calangute Beach", 0), ("Aguada Fort", 50),
-                ("Basilica of Bom Jesus", 0), ("Anjuna Market", 0)
-            ],
-            "food_budget": [
-                ("Beach shacks", 200), ("Ritz Classic", 180)
-            ],
-            "food_mid": [
-                ("Curlies", 400), ("Britto's", 500)
-            ]
-        }
-    }
-    
-    city_data = city_places.get(city_name, None)
+    """Local plan from the POI catalog: interest-matched, within the daily allocations, grouped by area"""
+    catalog = poi_catalog.get_catalog()
+
+    attractions = catalog.select(city_name, "attraction")
+    if daily_budget < 1500:
+        eatery_bands = ("free", "budget")
+    elif daily_budget < 6000:
+        eatery_bands = ("budget", "mid")
+    else:
+        eatery_bands = ("mid", "premium")
+    eateries = catalog.select(city_name, "eatery", bands=eatery_bands) or catalog.select(city_name, "eatery")
+
+    selection = budget_optimizer.optimize_days(
+        city_name, attractions, eateries, interests, days, daily_activities, daily_food, exclude_text, catalog
+    )
+    per_transport = daily_transport // 3
+
+    def name(poi, default: str) -> str:
+        return poi.display_name(city_name) if poi else default
+
+    def cost(poi) -> int:
+        return poi.price if poi else 0
+
     fallback = []
-    
-    for i in range(1, days + 1):
-        breakfast_cost = daily_food // 4
-        lunch_cost = daily_food // 3
-        dinner_cost = daily_food // 2
-        per_transport = daily_transport // 3
-        
-        if city_data:
-            attractions = city_data["attractions"]
-            foods = city_data["food_budget"] if daily_budget < 1500 else city_data.get("food_mid", city_data["food_budget"])
-            
-            attr1 = attractions[(i * 2 - 2) % len(attractions)]
-            attr2 = attractions[(i * 2 - 1) % len(attractions)]
-            food_place = foods[(i - 1) % len(foods)]
-            
-            fallback.append({
-                "day": i,
-                "morning": f"8 AM - Breakfast at local cafe (₹{breakfast_cost}) → 10 AM - Visit {attr1[0]} (Entry: ₹{attr1[1]}) | {transport_mode}: ₹{per_transport}",
-                "afternoon": f"1 PM - Lunch at {food_place[0]} (₹{min(lunch_cost, food_place[1])}) → 3 PM - Explore {attr2[0]} (₹{attr2[1]}) | {transport_mode}: ₹{per_transport}",
-                "evening": f"7 PM - Dinner at local restaurant (₹{dinner_cost}) → Evening walk & shopping | {transport_mode}: ₹{per_transport}"
-            })
-        else:
-            fallback.append({
-                "day": i,
-                "morning": f"8 AM - Breakfast (₹{breakfast_cost}) → 10 AM - Explore {city_name} attractions (₹{daily_activities//2}) | {transport_mode}: ₹{per_transport}",
-                "afternoon": f"1 PM - Lunch at local restaurant (₹{lunch_cost}) → 3 PM - Visit local markets | {transport_mode}: ₹{per_transport}",
-                "evening": f"7 PM - Dinner (₹{dinner_cost}) → Evening stroll | {transport_mode}: ₹{per_transport}"
-            })
-    
+    for i, day in enumerate(selection, start=1):
+        breakfast, lunch, dinner = day["breakfast"], day["lunch"], day["dinner"]
+        morning, afternoon, evening = day["morning"], day["afternoon"], day["evening"]
+        evening_plan = f"{name(evening, '')} (₹{cost(evening)})" if evening else "Evening walk & shopping"
+        # Meals with no catalog place that fits share whatever food budget is left
+        unfilled = [breakfast, lunch, dinner].count(None)
+        spare = max(daily_food - cost(breakfast) - cost(lunch) - cost(dinner), 0) // max(unfilled, 1)
+
+        def meal_cost(poi) -> int:
+            return poi.price if poi else spare
+
+        entry = {
+            "day": i,
+            "morning": f"8 AM - Breakfast at {name(breakfast, 'home-style breakfast')} (₹{meal_cost(breakfast)}) → 10 AM - Visit {name(morning, f'{city_name} old town')} (Entry: ₹{cost(morning)}) | {transport_mode}: ₹{per_transport}",
+            "afternoon": f"1 PM - Lunch at {name(lunch, 'local dhaba')} (₹{meal_cost(lunch)}) → 3 PM - Explore {name(afternoon, 'local markets')} (₹{cost(afternoon)}) | {transport_mode}: ₹{per_transport}",
+            "evening": f"7 PM - Dinner at {name(dinner, 'local dhaba')} (₹{meal_cost(dinner)}) → {evening_plan} | {transport_mode}: ₹{per_transport}"
+        }
+        # Distance between the day's stops in visiting order (curated cities only)
+        if day["travel_km"] is not None:
+            entry["travel_km"] = day["travel_km"]
+        fallback.append(entry)
+
     return fallback
 
 
+def itinerary_detail_query(itinerary_id: int):
+    # day_plans come in one extra query up front instead of a lazy load during serialization
+    return (
+        select(models.Itinerary)
+        .options(selectinload(models.Itinerary.day_plans))
+        .where(models.Itinerary.id == itinerary_id)
+    )
+
+
 def get_itinerary(db: Session, itinerary_id: int) -> Optional[models.Itinerary]:
-    return db.query(models.Itinerary).filter(models.Itinerary.id == itinerary_id).first()
+    return db.scalars(itinerary_detail_query(itinerary_id)).first()
+
+
+async def get_itinerary_async(db: AsyncSession, itinerary_id: int) -> Optional[models.Itinerary]:
+    return (await db.scalars(itinerary_detail_query(itinerary_id))).first()
 
 
 def get_user_itineraries(db: Session, user_id: int) -> List[models.Itinerary]:
@@ -355,11 +808,45 @@ def get_user_itineraries(db: Session, user_id: int) -> List[models.Itinerary]:
     ).order_by(models.Itinerary.id.desc()).all()
 
 
-def list_itineraries(db: Session, user_id: Optional[int] = None) -> List[models.Itinerary]:
-    query = db.query(models.Itinerary)
-    if user_id:
-        query = query.filter(models.Itinerary.user_id == user_id)
-    return query.order_by(models.Itinerary.id.desc()).all()
+# Columns of schemas.ItineraryListOut; listing never loads plans or days
+ITINERARY_LIST_COLUMNS = (
+    models.Itinerary.id, models.Itinerary.city, models.Itinerary.days, models.Itinerary.budget,
+    models.Itinerary.travel_style, models.Itinerary.accommodation,
+)
+ITINERARY_PAGE_MAX = 100
+
+
+def itinerary_page_query(user_id: Optional[int], cursor: Optional[int], limit: int):
+    """
+    Newest-first keyset page: rows with id below cursor. One row beyond limit is
+    fetched to tell whether another page follows. Served from the primary key,
+    or from ix_itineraries_user_id_id for one user, so deep pages cost the same
+    as the first.
+    """
+    query = select(*ITINERARY_LIST_COLUMNS)
+    if user_id is not None:
+        query = query.where(models.Itinerary.user_id == user_id)
+    if cursor is not None:
+        query = query.where(models.Itinerary.id < cursor)
+    return query.order_by(models.Itinerary.id.desc()).limit(limit + 1)
+
+
+def itinerary_page(rows: list, limit: int) -> schemas.ItineraryPage:
+    items = [schemas.ItineraryListOut.model_validate(row) for row in rows[:limit]]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return schemas.ItineraryPage(items=items, next_cursor=next_cursor)
+
+
+def list_itineraries(
+    db: Session, user_id: Optional[int] = None, cursor: Optional[int] = None, limit: int = 20
+) -> schemas.ItineraryPage:
+    return itinerary_page(db.execute(itinerary_page_query(user_id, cursor, limit)).all(), limit)
+
+
+async def list_itineraries_async(
+    db: AsyncSession, user_id: Optional[int] = None, cursor: Optional[int] = None, limit: int = 20
+) -> schemas.ItineraryPage:
+    return itinerary_page((await db.execute(itinerary_page_query(user_id, cursor, limit))).all(), limit)
 
 
 def delete_itinerary(db: Session, itinerary_id: int, user_id: int) -> bool:
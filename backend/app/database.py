@@ -1,22 +1,280 @@
+import itertools
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import telemetry
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set in .env")
+# -------- Pool settings (apply to the sync and the async engine) --------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections older than this many seconds are replaced (under server/proxy idle timeouts)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Per-statement server-side timeout on PostgreSQL (0 = no limit)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def to_async_url(url: str) -> str:
+    """The same database through its async driver (asyncpg / aiosqlite)"""
+    if not url:
+        raise ValueError("DATABASE_URL is not set in .env")
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def timed_pool(pool_class, engine_label: str):
+    """pool_class that records how long each checkout waited for a connection"""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                telemetry.record_pool_wait(engine_label, time.perf_counter() - start)
+
+    return TimedPool
+
+
+def engine_options(url: str, pool_class, engine_label: str) -> dict:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in one connection; keep SQLAlchemy's default pool
+        return {}
+
+    options = {
+        "poolclass": timed_pool(pool_class, engine_label),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+# Comma-separated read-only replica URLs; without any, reads go to the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a user writes, their reads stay on the primary this long (covers replica lag)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# Engines are built on first use, so importing the app needs no database
+# (and scripts that only use the sync path need no async driver)
+engine = None
+async_engine = None
+AsyncSessionLocal = None
+replica_engines = None
+async_replica_engines = None
+
+
+def get_engine():
+    global engine
+    if engine is None:
+        if not DATABASE_URL:
+            raise ValueError("DATABASE_URL is not set in .env")
+        engine = create_engine(DATABASE_URL, echo=False, **engine_options(DATABASE_URL, QueuePool, "sync"))
+    return engine
+
+
+class LazySession(Session):
+    """Session bound to the sync engine, which is created by the first query"""
 
-engine = create_engine(DATABASE_URL, echo=False)
+    def get_bind(self, mapper=None, clause=None, **kw):
+        return get_engine()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SessionLocal = sessionmaker(class_=LazySession, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
 
+def create_schema():
+    """Create missing tables and indexes (simple approach; for production use Alembic)"""
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add indexes declared since then
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    add_missing_columns(engine)
+
+
+def add_missing_columns(engine):
+    """Add nullable columns declared since their table was created (existing rows get NULL)"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"🧱 Added column {table.name}.{column.name}")
+
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        url = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+        async_engine = create_async_engine(url, echo=False, **engine_options(url, AsyncAdaptedQueuePool, "async"))
+    return async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        # Objects stay readable after commit without another round trip
+        AsyncSessionLocal = async_sessionmaker(
+            get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return AsyncSessionLocal
+
+
+# -------- Read replicas --------
+def get_replica_engines() -> list:
+    global replica_engines
+    if replica_engines is None:
+        replica_engines = [
+            create_engine(url, echo=False, **engine_options(url, QueuePool, f"replica{i}"))
+            for i, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+        ]
+    return replica_engines
+
+
+def get_async_replica_engines() -> list:
+    global async_replica_engines
+    if async_replica_engines is None:
+        async_replica_engines = [
+            create_async_engine(
+                to_async_url(url), echo=False,
+                **engine_options(to_async_url(url), AsyncAdaptedQueuePool, f"replica{i}-async")
+            )
+            for i, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+        ]
+    return async_replica_engines
+
+
+_replica_turn = itertools.count()
+
+
+class ReadSession(Session):
+    """
+    Session for read-only routes. Each session uses one replica, taken in turn
+    when it is created, or the primary when there are no replicas or it has
+    been pinned with pin_primary().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.turn = next(_replica_turn)
+        self.use_primary = False
+
+    def primary(self):
+        return get_engine()
+
+    def replicas(self) -> list:
+        return get_replica_engines()
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas = self.replicas()
+        if self.use_primary or not replicas:
+            return self.primary()
+        return replicas[self.turn % len(replicas)]
+
+
+class AsyncReadSession(ReadSession):
+    """ReadSession behind an AsyncSession, routed over the async engines"""
+
+    def primary(self):
+        return get_async_engine().sync_engine
+
+    def replicas(self) -> list:
+        return [replica.sync_engine for replica in get_async_replica_engines()]
+
+
+ReadSessionLocal = sessionmaker(class_=ReadSession, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession, sync_session_class=AsyncReadSession, autoflush=False, expire_on_commit=False
+)
+
+
+def pin_primary(db):
+    """Send a read session to the primary; call before its first query"""
+    (db.sync_session if isinstance(db, AsyncSession) else db).use_primary = True
+
+
+class RecentWrites:
+    """
+    Users who wrote in the last window seconds, whose reads should see that
+    write. Kept per process: a read served by another worker can still hit a
+    lagging replica, so routes that fetch a single row also retry a miss on the
+    primary.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) > 10000:
+                self._until = {user: until for user, until in self._until.items() if until > now}
+            self._until[user_id] = now + self.window
+
+    def active(self, user_id) -> bool:
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+recent_writes = RecentWrites(READ_YOUR_WRITES_SECONDS)
+
+
+async def dispose_async_engine():
+    for async_db in [async_engine] + (async_replica_engines or []):
+        if async_db is not None:
+            await async_db.dispose()
+
+
+def pool_stats() -> dict:
+    stats = {"sync": engine.pool.status() if engine is not None else "not connected"}
+    if async_engine is not None:
+        stats["async"] = async_engine.pool.status()
+    for i, replica in enumerate(replica_engines or [], start=1):
+        stats[f"replica{i}"] = replica.pool.status()
+    for i, replica in enumerate(async_replica_engines or [], start=1):
+        stats[f"replica{i}-async"] = replica.pool.status()
+    return stats
+
+
 # Dependency for FastAPI routes
 def get_db():
     db = SessionLocal()
@@ -24,3 +282,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency for async routes: DB calls are awaited on the event loop, no threadpool hop
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+# Dependencies for read-only routes (replica when configured)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,209 @@
+"""
+Small geometry toolkit for the local planner: great-circle distances,
+balanced k-means for grouping POIs into days, a nearest-neighbour + 2-opt
+route heuristic, and a grid index for nearest-POI lookups. Everything works
+on (lat, lng) arrays in degrees and returns kilometres.
+"""
+import itertools
+import math
+from collections import defaultdict
+from typing import List, Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Routes with at most this many stops are solved exactly
+EXACT_ROUTE_MAX = 6
+# Below this many points a GridIndex just scans them all
+GRID_SCAN_MAX = 64
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance; any argument may be a NumPy array (broadcasts)"""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_matrix(points: np.ndarray, others: Optional[np.ndarray] = None) -> np.ndarray:
+    others = points if others is None else others
+    return haversine_km(points[:, None, 0], points[:, None, 1], others[None, :, 0], others[None, :, 1])
+
+
+def path_km(points: np.ndarray) -> float:
+    """Length of the open path visiting points in the given order"""
+    if len(points) < 2:
+        return 0.0
+    return float(haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]).sum())
+
+
+def balanced_kmeans(points: np.ndarray, k: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """
+    Cluster labels for k groups of near-equal size (at most ceil(n / k) each).
+    k-means++ seeding and Lloyd iterations, then a final pass that assigns points
+    in order of closeness to a centroid that still has room.
+    """
+    n = len(points)
+    k = max(1, min(k, n))
+    if k == 1:
+        return np.zeros(n, dtype=int)
+
+    rng = np.random.default_rng(seed)
+    centroids = [points[rng.integers(n)]]
+    d2 = np.full(n, np.inf)
+    for _ in range(1, k):
+        last = centroids[-1]
+        d2 = np.minimum(d2, haversine_km(points[:, 0], points[:, 1], last[0], last[1]) ** 2)
+        total = d2.sum()
+        centroids.append(points[rng.choice(n, p=d2 / total)] if total > 0 else points[rng.integers(n)])
+    centroids = np.array(centroids)
+
+    labels = np.zeros(n, dtype=int)
+    for _ in range(iterations):
+        new_labels = distance_matrix(points, centroids).argmin(axis=1)
+        sizes = np.bincount(new_labels, minlength=k)
+        filled = sizes > 0
+        for axis in (0, 1):
+            sums = np.bincount(new_labels, weights=points[:, axis], minlength=k)
+            centroids[filled, axis] = sums[filled] / sizes[filled]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    # Capacity pass: each cluster keeps its closest members, the overflow goes
+    # to the nearest clusters that still have room, closest pairs first
+    capacity = math.ceil(n / k)
+    distances = distance_matrix(points, centroids)
+    nearest = distances.argmin(axis=1)
+    order = np.lexsort((distances[np.arange(n), nearest], nearest))
+    rank = np.arange(n) - np.searchsorted(nearest[order], nearest[order], side="left")
+    labels = nearest.copy()
+    counts = np.bincount(nearest[order[rank < capacity]], minlength=k)
+
+    overflow = order[rank >= capacity]
+    placed = np.zeros(len(overflow), dtype=bool)
+    remaining = len(overflow)
+    for flat in np.argsort(distances[overflow], axis=None).tolist():
+        row, cluster = divmod(flat, k)
+        if placed[row] or counts[cluster] >= capacity:
+            continue
+        placed[row] = True
+        labels[overflow[row]] = cluster
+        counts[cluster] += 1
+        remaining -= 1
+        if not remaining:
+            break
+    return labels
+
+
+def route_order(points: np.ndarray, start: int = 0) -> List[int]:
+    """
+    Visiting order for an open path. Up to EXACT_ROUTE_MAX stops (a single
+    day) every order is tried; larger sets use a nearest-neighbour tour from
+    start, improved with 2-opt.
+    """
+    n = len(points)
+    if n <= 2:
+        return list(range(n))
+
+    distances = distance_matrix(points)
+    if n <= EXACT_ROUTE_MAX:
+        return list(min(
+            itertools.permutations(range(n)),
+            key=lambda order: sum(distances[a, b] for a, b in zip(order, order[1:]))
+        ))
+
+    order = [start]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[start] = False
+    for _ in range(n - 1):
+        last = order[-1]
+        nxt = int(np.where(unvisited, distances[last], np.inf).argmin())
+        order.append(nxt)
+        unvisited[nxt] = False
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            # Reverse order[i:j+1]; the tail end of an open path has no closing edge
+            for j in range(i + 1, n):
+                c = order[j]
+                d = order[j + 1] if j + 1 < n else None
+                before = distances[a, b] + (distances[c, d] if d is not None else 0)
+                after = distances[a, c] + (distances[b, d] if d is not None else 0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+                    b = order[i]
+    return order
+
+
+class GridIndex:
+    """
+    Buckets points into square cells and searches outward ring by ring. The
+    default cell size gives about two points per cell, so lookups touch a few
+    cells whether a city has ten POIs or ten thousand.
+    """
+
+    def __init__(self, points: np.ndarray, cell_km: Optional[float] = None):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(self.points)
+        span = self.points.max(axis=0) - self.points.min(axis=0) if n else np.zeros(2)
+        if cell_km:
+            self.cell_deg = cell_km / 111.0
+        else:
+            self.cell_deg = max(math.sqrt(max(span[0], 1e-3) * max(span[1], 1e-3) * 2 / max(n, 1)), 1e-4)
+
+        cells = defaultdict(list)
+        for i, (lat, lng) in enumerate(self.points):
+            cells[self._cell(lat, lng)].append(i)
+        self.cells = {key: np.array(members) for key, members in cells.items()}
+        rows = [r for r, _ in self.cells] or [0]
+        cols = [c for _, c in self.cells] or [0]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat: float, lng: float):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def _ring(self, row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> List[int]:
+        """Indexes of the k points closest to (lat, lng), nearest first"""
+        if not len(self.points):
+            return []
+        k = min(k, len(self.points))
+        if len(self.points) <= GRID_SCAN_MAX:
+            distances = haversine_km(lat, lng, self.points[:, 0], self.points[:, 1])
+            return np.argsort(distances)[:k].tolist()
+        row, col = self._cell(lat, lng)
+        # Smallest km per degree across both axes, so the ring bound never overestimates
+        km_per_cell = self.cell_deg * 111.0 * math.cos(math.radians(min(abs(lat), 89)))
+        min_row, max_row, min_col, max_col = self.bounds
+        last_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        found, count = [], 0
+        for ring in range(last_ring + 1):
+            for key in self._ring(row, col, ring):
+                members = self.cells.get(key)
+                if members is not None:
+                    found.append(members)
+                    count += len(members)
+            if count >= k:
+                candidates = np.concatenate(found)
+                distances = haversine_km(lat, lng, self.points[candidates, 0], self.points[candidates, 1])
+                # Points outside the rings searched so far are at least ring cells away
+                if np.partition(distances, k - 1)[k - 1] <= ring * km_per_cell:
+                    return candidates[np.argsort(distances)[:k]].tolist()
+        candidates = np.concatenate(found)
+        distances = haversine_km(lat, lng, self.points[candidates, 0], self.points[candidates, 1])
+        return candidates[np.argsort(distances)[:k]].tolist()
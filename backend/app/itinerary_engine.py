@@ -0,0 +1,372 @@
+"""
+Tiered itinerary engine behind POST /api/itineraries, its SSE stream and the job workers.
+
+Each request is served by the first strategy, in order, that can answer
+within the caller's latency budget:
+  cache  - a stored plan for the same normalized request
+  llm    - Gemini generation, coalesced per cache key and cached when complete
+  local  - the catalog planner, always available as the floor
+Every strategy keeps a moving average of its own latency. The LLM tier is
+skipped when that estimate doesn't fit what is left of the budget, and it is
+cut off if it runs past the budget. The shared generation then carries on in
+the background, still fills the cache for the next request, and its real
+duration updates the estimate. While the tier looks too slow, one request per
+ENGINE_PROBE_INTERVAL_SECONDS tries it anyway, so a recovered Gemini is
+noticed. The tier that produced the plan is returned on ItineraryOut.tier
+(and ItineraryJobOut.tier for jobs).
+"""
+import abc
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import crud, models, result_cache, schemas, telemetry
+from .database import SessionLocal, recent_writes
+from .single_flight import FlightConflict, SingleFlight
+
+# Latency budget applied when the caller doesn't send one (unset = no limit)
+_default_budget = os.getenv("ITINERARY_LATENCY_BUDGET_MS")
+ITINERARY_LATENCY_BUDGET_MS = int(_default_budget) if _default_budget else None
+# Starting latency estimates, refined by a moving average of observed runs
+ENGINE_LLM_ESTIMATE_SECONDS = float(os.getenv("ENGINE_LLM_ESTIMATE_SECONDS", "10"))
+ENGINE_LOCAL_ESTIMATE_SECONDS = float(os.getenv("ENGINE_LOCAL_ESTIMATE_SECONDS", "0.01"))
+# Weight of the newest observation in each estimate
+ENGINE_EWMA_ALPHA = float(os.getenv("ENGINE_EWMA_ALPHA", "0.2"))
+# How often a request may try the LLM tier although its estimate exceeds the budget
+ENGINE_PROBE_INTERVAL_SECONDS = float(os.getenv("ENGINE_PROBE_INTERVAL_SECONDS", "30"))
+
+# Identical creates from one user share a single in-flight request
+_create_flights = SingleFlight()
+# Identical generations (same normalized cache key) share a single Gemini call
+_generation_flights = SingleFlight()
+
+
+class PlanRequest:
+    """Everything a strategy needs to produce a plan for one request"""
+
+    def __init__(self, itinerary_in: schemas.ItineraryRequest, city: models.City, cache_key: str, cached):
+        self.itinerary_in = itinerary_in
+        self.city = city
+        self.cache_key = cache_key
+        self.cached = cached
+        self.budget = crud.calculate_budget(itinerary_in)
+
+
+class Strategy(abc.ABC):
+    name = ""
+    # Relative cost per run (Gemini requests made), reported by /api/admin/engine
+    cost = 0.0
+    # The last resort: whatever it returns is served, even an empty plan
+    floor = False
+
+    def __init__(self, estimate_seconds: float):
+        self.estimate = estimate_seconds
+        self.runs = 0
+        self.served = 0
+
+    def observe(self, seconds: float):
+        self.runs += 1
+        self.estimate += ENGINE_EWMA_ALPHA * (seconds - self.estimate)
+
+    def admissible(self, request: PlanRequest, remaining: Optional[float]) -> bool:
+        return remaining is None or self.estimate <= remaining
+
+    @abc.abstractmethod
+    async def run(self, request: PlanRequest, remaining: Optional[float]):
+        """(plan, telemetry source), or (None, None) when this tier can't answer"""
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "cost": self.cost,
+            "estimate_ms": round(self.estimate * 1000, 1),
+            "runs": self.runs,
+            "served": self.served,
+        }
+
+
+class CacheStrategy(Strategy):
+    name = "cache"
+
+    def admissible(self, request: PlanRequest, remaining: Optional[float]) -> bool:
+        # The lookup already happened while preparing the request
+        return request.cached is not None
+
+    async def run(self, request: PlanRequest, remaining: Optional[float]):
+        start = time.perf_counter()
+        # Cached plans are checked too: the cache key only buckets the budget
+        plan = await run_in_threadpool(
+            crud.enforce_budget, request.cached, request.city, request.itinerary_in, request.budget
+        )
+        self.observe(time.perf_counter() - start)
+        return plan, "cache"
+
+
+class LLMStrategy(Strategy):
+    name = "llm"
+    cost = 1.0
+
+    def __init__(self, estimate_seconds: float):
+        super().__init__(estimate_seconds)
+        self.last_attempt = time.monotonic()
+
+    def admissible(self, request: PlanRequest, remaining: Optional[float]) -> bool:
+        if crud.gemini_client is None:
+            return False
+        if super().admissible(request, remaining):
+            return True
+        # Probe now and then: the estimate only comes back down through runs
+        return bool(remaining) and time.monotonic() - self.last_attempt >= ENGINE_PROBE_INTERVAL_SECONDS
+
+    def _observe_flight(self, task: asyncio.Future, start: float):
+        self.observe(time.perf_counter() - start)
+        if not task.cancelled() and task.exception():
+            # Retrieved here too, so a flight nobody waits for any more doesn't log "never retrieved"
+            print(f"❌ Background generation failed: {task.exception()}")
+
+    async def run(self, request: PlanRequest, remaining: Optional[float]):
+        self.last_attempt = time.monotonic()
+        itinerary_in, city, budget = request.itinerary_in, request.city, request.budget
+        ai_kwargs = crud.build_ai_kwargs(city, itinerary_in, budget)
+        flight = asyncio.ensure_future(_generation_flights.do(
+            request.cache_key, lambda: _generate_and_cache(request.cache_key, city.name, ai_kwargs)
+        ))
+        start = time.perf_counter()
+        # Observe the real duration, also when the generation outlives this request's budget
+        flight.add_done_callback(lambda task: self._observe_flight(task, start))
+        try:
+            plan = await asyncio.wait_for(asyncio.shield(flight), remaining)
+        except asyncio.TimeoutError:
+            print(f"⏱️ Latency budget reached after {remaining:.1f}s; generation continues in the background")
+            return None, None
+        if not plan:
+            return None, None
+
+        source = "ai" if crud.is_complete_plan(plan, itinerary_in.days) else "partial"
+        return await run_in_threadpool(_finish_generated_plan, plan, request), source
+
+
+def _finish_generated_plan(plan: list, request: PlanRequest) -> list:
+    """Fill the days generation left out from the local planner, then hold the plan to the budget"""
+    itinerary_in, city, budget = request.itinerary_in, request.city, request.budget
+    if not crud.is_complete_plan(plan, itinerary_in.days):
+        plan = crud.fill_missing_days(plan, crud.build_fallback_plan(city, itinerary_in, budget), itinerary_in.days)
+    return crud.enforce_budget(plan, city, itinerary_in, budget)
+
+
+class LocalStrategy(Strategy):
+    name = "local"
+    floor = True
+
+    def admissible(self, request: PlanRequest, remaining: Optional[float]) -> bool:
+        # The floor: answers however little budget is left
+        return True
+
+    async def run(self, request: PlanRequest, remaining: Optional[float]):
+        start = time.perf_counter()
+        plan = await run_in_threadpool(crud.build_fallback_plan, request.city, request.itinerary_in, request.budget)
+        self.observe(time.perf_counter() - start)
+        return plan, "fallback"
+
+
+STRATEGIES = [
+    CacheStrategy(0.0),
+    LLMStrategy(ENGINE_LLM_ESTIMATE_SECONDS),
+    LocalStrategy(ENGINE_LOCAL_ESTIMATE_SECONDS),
+]
+
+
+def engine_snapshot() -> dict:
+    return {
+        "default_budget_ms": ITINERARY_LATENCY_BUDGET_MS,
+        "strategies": [strategy.snapshot() for strategy in STRATEGIES],
+    }
+
+
+async def plan_itinerary(request: PlanRequest, budget_ms: Optional[int] = None, started: Optional[float] = None):
+    """(plan, tier) from the first admissible strategy that produces a plan"""
+    started = time.perf_counter() if started is None else started
+    budget_ms = ITINERARY_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+    deadline = started + budget_ms / 1000 if budget_ms is not None else None
+
+    for strategy in STRATEGIES:
+        remaining = max(deadline - time.perf_counter(), 0.0) if deadline is not None else None
+        if not strategy.admissible(request, remaining):
+            continue
+        plan, source = await strategy.run(request, remaining)
+        if plan or (strategy.floor and plan is not None):
+            strategy.served += 1
+            telemetry.record_plan(
+                source, time.perf_counter() - started, request.city.name, request.itinerary_in.days
+            )
+            return plan, strategy.name
+    raise RuntimeError("No itinerary strategy produced a plan")
+
+
+# -------- Create (async routes and job workers) --------
+def _store_in_cache(cache_key: str, city_name: str, plan: list):
+    db = SessionLocal()
+    try:
+        result_cache.store_plan(db, cache_key, city_name, plan)
+    finally:
+        db.close()
+
+
+async def _generate_and_cache(cache_key: str, city_name: str, ai_kwargs: dict) -> Optional[list]:
+    ai_data = await crud.generate_plan_async(**ai_kwargs)
+    # Partial plans (a chunk fell back) aren't worth serving to the next user
+    if crud.is_complete_plan(ai_data, ai_kwargs["days"]):
+        await run_in_threadpool(_store_in_cache, cache_key, city_name, ai_data)
+    return ai_data
+
+
+async def create_itinerary(
+    itinerary_in: schemas.ItineraryRequest,
+    user_id: int,
+    idempotency_key: Optional[str] = None,
+    latency_budget_ms: Optional[int] = None
+) -> schemas.ItineraryOut:
+    """
+    Create and store an itinerary without blocking the event loop.
+    DB work and the NumPy planning run in the threadpool; Gemini calls await
+    the async client.
+
+    Concurrent duplicates (same Idempotency-Key, or same body and latency
+    budget when no key is sent) from one user are coalesced and receive the
+    same itinerary. Reusing an in-flight Idempotency-Key with a different
+    body gets a 409, as it would once the first request is stored.
+    """
+    request_hash = crud.hash_request(itinerary_in)
+    if idempotency_key:
+        flight_key = ("key", user_id, idempotency_key)
+    else:
+        flight_key = ("body", user_id, request_hash, latency_budget_ms)
+    started = time.perf_counter()
+
+    async def _create():
+        # Runs on its own session: the caller that started the flight may go away
+        # while other waiters still need the result
+        task_db = SessionLocal()
+        try:
+            return await _create_itinerary(
+                task_db, itinerary_in, user_id, idempotency_key, request_hash, latency_budget_ms, started
+            )
+        finally:
+            await run_in_threadpool(task_db.close)
+
+    try:
+        # A keyed retry with a different body must not join the first body's flight
+        return await _create_flights.do(flight_key, _create, token=request_hash)
+    except FlightConflict:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency-Key was already used with a different request."
+        )
+
+
+async def _create_itinerary(
+    db: Session,
+    itinerary_in: schemas.ItineraryRequest,
+    user_id: int,
+    idempotency_key: Optional[str],
+    request_hash: str,
+    latency_budget_ms: Optional[int],
+    started: float
+) -> schemas.ItineraryOut:
+    existing, city, cache_key, cached = await run_in_threadpool(
+        crud.prepare_create, db, itinerary_in, user_id, idempotency_key, request_hash
+    )
+    if existing:
+        return existing.model_copy(update={"tier": "idempotent"})
+
+    request = PlanRequest(itinerary_in, city, cache_key, cached)
+    plan, tier = await plan_itinerary(request, latency_budget_ms, started)
+
+    # Serialize inside the threadpool too, so lazy-loaded day_plans never hit the DB from the event loop
+    def _save():
+        db_itinerary = crud.save_itinerary(
+            db, itinerary_in, city, plan, user_id, idempotency_key, request_hash
+        )
+        return schemas.ItineraryOut.model_validate(db_itinerary)
+
+    itinerary = await run_in_threadpool(_save)
+    recent_writes.mark(user_id)
+    return itinerary.model_copy(update={"tier": tier})
+
+
+# -------- Streaming (SSE) --------
+async def start_itinerary_stream(itinerary_in: schemas.ItineraryRequest, user_id: int):
+    """
+    Validate the request, then return an async generator of (event, data) pairs:
+    one "meta", a "day" per completed day, then "done" with the stored itinerary.
+    Uses the same tiers as create_itinerary, except that the LLM tier streams
+    its days as they arrive. Validation errors (unknown city) raise here,
+    before any bytes are sent.
+    """
+    db = SessionLocal()
+    try:
+        _, city, cache_key, cached = await run_in_threadpool(
+            crud.prepare_create, db, itinerary_in, user_id, None, None
+        )
+    except Exception:
+        await run_in_threadpool(db.close)
+        raise
+    request = PlanRequest(itinerary_in, city, cache_key, cached)
+    cache, llm, local = STRATEGIES
+
+    async def events():
+        try:
+            yield "meta", {"city": city.name, "days": itinerary_in.days, "cached": cached is not None}
+
+            started = time.perf_counter()
+            plan, generated_days, strategy, source = [], [], None, None
+            if cache.admissible(request, None):
+                strategy = cache
+                plan, source = await cache.run(request, None)
+                for day in plan:
+                    yield "day", day
+            elif llm.admissible(request, None):
+                strategy, source = llm, "ai"
+                llm.last_attempt = time.monotonic()
+                start = time.perf_counter()
+                ai_kwargs = crud.build_ai_kwargs(city, itinerary_in, request.budget)
+                async for day in crud.stream_gemini_days(**ai_kwargs):
+                    generated_days.append(day)
+                    # Days are checked one at a time as they arrive; the cache keeps them as generated
+                    day = (await run_in_threadpool(crud.enforce_budget, [day], city, itinerary_in, request.budget))[0]
+                    plan.append(day)
+                    yield "day", day
+                if generated_days:
+                    llm.observe(time.perf_counter() - start)
+            generated = len(generated_days) >= itinerary_in.days
+
+            if len(plan) < itinerary_in.days:
+                # Model failed (or was unavailable) part-way: finish with the local planner
+                fallback, _ = await local.run(request, None)
+                if plan:
+                    source = "partial"
+                else:
+                    strategy, source = local, "fallback"
+                for day in fallback[len(plan):]:
+                    plan.append(day)
+                    yield "day", day
+            strategy.served += 1
+            telemetry.record_plan(source, time.perf_counter() - started, city.name, itinerary_in.days)
+
+            def _save():
+                if generated:
+                    result_cache.store_plan(db, cache_key, city.name, generated_days)
+                return schemas.ItineraryOut.model_validate(crud.save_itinerary(db, itinerary_in, city, plan, user_id))
+
+            itinerary = await run_in_threadpool(_save)
+            recent_writes.mark(user_id)
+            yield "done", itinerary.model_copy(update={"tier": strategy.name}).model_dump(mode="json")
+        finally:
+            await run_in_threadpool(db.close)
+
+    return events()
@@ -0,0 +1,274 @@
+"""
+Database-backed job queue for itinerary generation (no external broker).
+
+POST /api/itineraries/jobs stores an ItineraryJob row and returns 202. Each
+app process runs JOB_WORKER_CONCURRENCY asyncio workers. They claim queued
+jobs with a conditional UPDATE, so several processes can share one table
+safely. Claimed jobs hold a lease of JOB_LEASE_SECONDS, which the worker
+renews while the job runs. If a worker dies mid-job, the lease expires and
+another worker picks the job up again; a sweep every JOB_SWEEP_INTERVAL_SECONDS
+fails jobs that died on their last attempt. Failures retry with exponential
+backoff up to JOB_MAX_ATTEMPTS.
+
+Each job generates with the Idempotency-Key "job-<id>". A retry after a
+crash between saving the itinerary and marking the job done therefore
+returns the already-stored itinerary instead of creating a second one.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from . import crud, itinerary_engine, models, schemas
+from .database import SessionLocal
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "180"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "60"))
+# Renew a running job's lease this often, well before it can expire
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+# -------- Queue operations --------
+def enqueue_job(db: Session, itinerary_in: schemas.ItineraryRequest, user_id: int) -> models.ItineraryJob:
+    # Reject unknown cities now rather than in a worker minutes later
+    crud.get_city_or_404(db, itinerary_in.city)
+
+    job = models.ItineraryJob(
+        user_id=user_id,
+        status=QUEUED,
+        request=itinerary_in.model_dump(),
+        max_attempts=JOB_MAX_ATTEMPTS,
+        next_run_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.ItineraryJob]:
+    return db.query(models.ItineraryJob).filter(models.ItineraryJob.id == job_id).first()
+
+
+def fail_abandoned_jobs(db: Session, now: datetime) -> int:
+    """Fail jobs whose worker died (lease expired) on their last allowed attempt, e.g. killed by OOM"""
+    failed = db.query(models.ItineraryJob).filter(
+        models.ItineraryJob.status == RUNNING,
+        models.ItineraryJob.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS),
+        models.ItineraryJob.attempts >= models.ItineraryJob.max_attempts,
+    ).update({
+        models.ItineraryJob.status: FAILED,
+        models.ItineraryJob.error: "Worker stopped during the last attempt (lease expired)",
+        models.ItineraryJob.locked_by: None,
+        models.ItineraryJob.locked_at: None,
+        models.ItineraryJob.updated_at: now,
+    }, synchronize_session=False)
+    db.commit()
+    return failed
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[models.ItineraryJob]:
+    """Claim the oldest runnable job: queued and due, or running with an expired lease and attempts left"""
+    now = datetime.utcnow()
+    # Exhausted jobs are left for the sweep (fail_abandoned_jobs), not retried forever
+    runnable = or_(
+        and_(models.ItineraryJob.status == QUEUED, models.ItineraryJob.next_run_at <= now),
+        and_(models.ItineraryJob.status == RUNNING,
+             models.ItineraryJob.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS),
+             models.ItineraryJob.attempts < models.ItineraryJob.max_attempts),
+    )
+    candidates = db.query(models.ItineraryJob.id, models.ItineraryJob.status, models.ItineraryJob.locked_by).filter(
+        runnable
+    ).order_by(models.ItineraryJob.id).limit(5).all()
+
+    for job_id, status, locked_by in candidates:
+        # Conditional update: only one worker (in any process) can win the row
+        claimed = db.query(models.ItineraryJob).filter(
+            models.ItineraryJob.id == job_id,
+            models.ItineraryJob.status == status,
+            models.ItineraryJob.locked_by.is_(None) if locked_by is None
+            else models.ItineraryJob.locked_by == locked_by
+        ).update({
+            models.ItineraryJob.status: RUNNING,
+            models.ItineraryJob.locked_by: worker_id,
+            models.ItineraryJob.locked_at: now,
+            models.ItineraryJob.attempts: models.ItineraryJob.attempts + 1,
+            models.ItineraryJob.updated_at: now,
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return get_job(db, job_id)
+    return None
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    renewed = db.query(models.ItineraryJob).filter(
+        models.ItineraryJob.id == job_id,
+        models.ItineraryJob.locked_by == worker_id
+    ).update({models.ItineraryJob.locked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(renewed)
+
+
+def complete_job(db: Session, job_id: int, worker_id: str, itinerary: schemas.ItineraryOut):
+    db.query(models.ItineraryJob).filter(
+        models.ItineraryJob.id == job_id,
+        models.ItineraryJob.locked_by == worker_id
+    ).update({
+        models.ItineraryJob.status: SUCCEEDED,
+        models.ItineraryJob.itinerary_id: itinerary.id,
+        models.ItineraryJob.tier: itinerary.tier,
+        models.ItineraryJob.locked_by: None,
+        models.ItineraryJob.locked_at: None,
+        models.ItineraryJob.error: None,
+        models.ItineraryJob.updated_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+
+
+def fail_job(db: Session, job: models.ItineraryJob, worker_id: str, error: str, retryable: bool = True):
+    now = datetime.utcnow()
+    if retryable and job.attempts < job.max_attempts:
+        delay = JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+        values = {models.ItineraryJob.status: QUEUED, models.ItineraryJob.next_run_at: now + timedelta(seconds=delay)}
+    else:
+        values = {models.ItineraryJob.status: FAILED}
+    values.update({
+        models.ItineraryJob.error: error[:500],
+        models.ItineraryJob.locked_by: None,
+        models.ItineraryJob.locked_at: None,
+        models.ItineraryJob.updated_at: now,
+    })
+    db.query(models.ItineraryJob).filter(
+        models.ItineraryJob.id == job.id,
+        models.ItineraryJob.locked_by == worker_id
+    ).update(values, synchronize_session=False)
+    db.commit()
+
+
+def job_to_out(job: models.ItineraryJob) -> schemas.ItineraryJobOut:
+    out = schemas.ItineraryJobOut.model_validate(job)
+    if job.status == SUCCEEDED and job.itinerary is not None:
+        out.itinerary = schemas.ItineraryOut.model_validate(job.itinerary)
+        out.itinerary.tier = job.tier
+    return out
+
+
+# -------- Worker pool --------
+class JobWorkerPool:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+
+    async def start(self):
+        if self.concurrency <= 0 or self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        for i in range(self.concurrency):
+            worker_id = f"{os.getpid()}-{i}-{uuid.uuid4().hex[:6]}"
+            self._tasks.append(asyncio.create_task(self._run(worker_id)))
+        self._tasks.append(asyncio.create_task(self._sweep()))
+        print(f"🧵 Started {self.concurrency} itinerary job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers in this process right after an enqueue (safe from threadpool routes)"""
+        if self._loop is not None:
+            # asyncio.Event isn't thread-safe; set it on the loop that owns it
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _sweep(self):
+        while True:
+            db = SessionLocal()
+            try:
+                failed = await run_in_threadpool(fail_abandoned_jobs, db, datetime.utcnow())
+                if failed:
+                    print(f"⚠️ Failed {failed} itinerary jobs whose worker died on the last attempt")
+            except Exception as e:
+                print(f"❌ Job sweep error: {e}")
+            finally:
+                await run_in_threadpool(db.close)
+            await asyncio.sleep(JOB_SWEEP_INTERVAL_SECONDS)
+
+    async def _heartbeat(self, job_id: int, worker_id: str):
+        # Own session: the job's session is in use by the threadpool when this fires
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            db = SessionLocal()
+            try:
+                if not await run_in_threadpool(renew_lease, db, job_id, worker_id):
+                    return
+            except Exception as e:
+                print(f"❌ Lease renewal for job {job_id} failed: {e}")
+            finally:
+                await run_in_threadpool(db.close)
+
+    async def _run(self, worker_id: str):
+        while True:
+            try:
+                ran = await self._run_one(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Job worker {worker_id} error: {e}")
+                ran = False
+            if not ran:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _run_one(self, worker_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            job = await run_in_threadpool(claim_next_job, db, worker_id)
+            if job is None:
+                return False
+
+            print(f"🧾 Job {job.id} attempt {job.attempts} on {worker_id}")
+            heartbeat = asyncio.create_task(self._heartbeat(job.id, worker_id))
+            try:
+                itinerary = await itinerary_engine.create_itinerary(
+                    schemas.ItineraryRequest(**job.request),
+                    job.user_id,
+                    idempotency_key=f"job-{job.id}"
+                )
+            except HTTPException as e:
+                # Client errors (e.g. city deleted since enqueue) won't improve on retry
+                await run_in_threadpool(fail_job, db, job, worker_id, str(e.detail), False)
+            except Exception as e:
+                await run_in_threadpool(fail_job, db, job, worker_id, f"{type(e).__name__}: {e}")
+            else:
+                await run_in_threadpool(complete_job, db, job.id, worker_id, itinerary)
+            finally:
+                heartbeat.cancel()
+            return True
+        finally:
+            await run_in_threadpool(db.close)
+
+
+worker_pool = JobWorkerPool(JOB_WORKER_CONCURRENCY)
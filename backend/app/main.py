@@ -1,16 +1,65 @@
+import time
+
+# Taken before the app's own imports, so the startup report includes them
+IMPORT_STARTED = time.perf_counter()
+
+import os
+from contextlib import asynccontextmanager, contextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import Base, engine
+from .database import create_schema, dispose_async_engine, get_engine
 from .routers import itineraries as itineraries_router
 from .routers import users as users_router
 from app.routers import cities
+from .routers import admin as admin_router
+from . import crud, jobs, telemetry, poi_catalog, city_index, compression
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+# Create missing tables and indexes at startup (turn off once migrations manage the schema)
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "true").lower() == "true"
+
 
+@contextmanager
+def startup_step(report: dict, name: str):
+    start = time.perf_counter()
+    yield
+    report["steps_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
 
-# create tables (simple approach; for production use Alembic)
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="TripCraft AI Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    report = app.state.startup = {"import_ms": round(IMPORT_SECONDS * 1000, 1), "steps_ms": {}}
+    if DB_CREATE_SCHEMA:
+        with startup_step(report, "schema"):
+            await run_in_threadpool(create_schema)
+    # Compressed plans can't be written to the pre-compression json column (PostgreSQL)
+    with startup_step(report, "plan_column"):
+        await run_in_threadpool(compression.check_plan_column, get_engine())
+    with startup_step(report, "gemini_client"):
+        await run_in_threadpool(crud.init_gemini_client)
+    # Load the POI catalog now rather than on the first fallback plan
+    with startup_step(report, "poi_catalog"):
+        await run_in_threadpool(poi_catalog.get_catalog)
+    # City autocomplete index (reads every city name once)
+    with startup_step(report, "city_index"):
+        await run_in_threadpool(city_index.warm)
+    # Background itinerary job workers live as long as the app process
+    with startup_step(report, "job_workers"):
+        await jobs.worker_pool.start()
+    report["lifespan_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    steps = ", ".join(f"{name} {ms:.0f} ms" for name, ms in report["steps_ms"].items())
+    print(f"🚀 Startup: imports {report['import_ms']:.0f} ms, {steps}")
+    yield
+    await jobs.worker_pool.stop()
+    await dispose_async_engine()
+
+
+app = FastAPI(title="TripCraft AI Backend", lifespan=lifespan)
 
 # adjust this origin to your Vite dev URL
 origins = [
@@ -32,7 +81,15 @@ app.include_router(users_router.router)
 
 app.include_router(cities.router)
 
+app.include_router(admin_router.router)
+
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
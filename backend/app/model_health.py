@@ -0,0 +1,155 @@
+"""
+Process-wide health registry for the Gemini models in GEMINI_MODELS.
+
+Each model has a small circuit breaker:
+- 429 (quota) opens the breaker straight away for RATE_LIMIT_COOLDOWN_SECONDS
+- other API/network errors open it after BREAKER_FAILURE_THRESHOLD in a row
+- after the cooldown the breaker is half-open and lets a single probe through;
+  success closes it, failure re-opens it with a doubled cooldown
+- 404 disables the model until the process restarts
+
+Malformed output is not a health problem and doesn't count as a failure.
+"""
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("RATE_LIMIT_COOLDOWN_SECONDS", "60"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("BREAKER_MAX_COOLDOWN_SECONDS", "900"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+DISABLED = "disabled"
+
+
+def classify_error(e: Exception) -> str:
+    """Bucket a generation error: quota, not_found, invalid_output or error"""
+    if isinstance(e, (json.JSONDecodeError, ValueError)):
+        return "invalid_output"
+    code = getattr(e, "code", None)
+    error_msg = str(e)
+    if code == 429 or "429" in error_msg:
+        return "quota"
+    if code == 404 or "404" in error_msg:
+        return "not_found"
+    return "error"
+
+
+class ModelBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = 0.0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        retry_in = max(0.0, self.open_until - time.monotonic()) if self.state == OPEN else 0.0
+        return {
+            "model": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": round(retry_in, 1),
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ModelHealthRegistry:
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> ModelBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = ModelBreaker(name)
+        return breaker
+
+    def try_acquire(self, name: str) -> bool:
+        """True if a call to this model may go out now (claims the half-open probe slot)"""
+        with self._lock:
+            breaker = self._get(name)
+            if breaker.state == CLOSED:
+                return True
+            if breaker.state == DISABLED:
+                return False
+            if breaker.state == OPEN:
+                if time.monotonic() < breaker.open_until:
+                    return False
+                breaker.state = HALF_OPEN
+            if breaker.probe_in_flight:
+                return False
+            breaker.probe_in_flight = True
+            return True
+
+    def record_success(self, name: str):
+        with self._lock:
+            breaker = self._get(name)
+            breaker.state = CLOSED
+            breaker.consecutive_failures = 0
+            breaker.cooldown = 0.0
+            breaker.probe_in_flight = False
+            breaker.successes += 1
+
+    def record_failure(self, name: str, e: Exception):
+        kind = classify_error(e)
+        with self._lock:
+            breaker = self._get(name)
+            breaker.probe_in_flight = False
+            if kind == "invalid_output":
+                # The model answered; a bad reply says nothing about its availability
+                if breaker.state == HALF_OPEN:
+                    breaker.state = CLOSED
+                return
+
+            breaker.failures += 1
+            breaker.consecutive_failures += 1
+            breaker.last_error = f"{kind}: {str(e)[:120]}"
+
+            if kind == "not_found":
+                breaker.state = DISABLED
+                return
+
+            if kind == "quota" or breaker.state == HALF_OPEN or \
+                    breaker.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                base = RATE_LIMIT_COOLDOWN_SECONDS if kind == "quota" else BREAKER_COOLDOWN_SECONDS
+                breaker.cooldown = min(
+                    BREAKER_MAX_COOLDOWN_SECONDS,
+                    breaker.cooldown * 2 if breaker.cooldown else base
+                )
+                breaker.state = OPEN
+                breaker.open_until = time.monotonic() + breaker.cooldown
+
+    def release(self, name: str):
+        """Give back a probe slot for a call that was cancelled before it finished"""
+        with self._lock:
+            breaker = self._get(name)
+            if breaker.probe_in_flight:
+                breaker.probe_in_flight = False
+                if breaker.state == HALF_OPEN:
+                    breaker.state = OPEN
+
+    def reset(self, name: Optional[str] = None):
+        with self._lock:
+            if name:
+                self._breakers.pop(name, None)
+            else:
+                self._breakers.clear()
+
+    def snapshot(self, names: list) -> list:
+        with self._lock:
+            return [self._get(name).snapshot() for name in names]
+
+
+model_health = ModelHealthRegistry()
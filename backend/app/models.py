@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
+from .compression import CompressedJSON
 from sqlalchemy import JSON
 
 
@@ -27,6 +29,8 @@ class City(Base):
 
 class Itinerary(Base):
     __tablename__ = "itineraries"
+    # Per-user history pages: WHERE user_id = ? AND id < cursor ORDER BY id DESC
+    __table_args__ = (Index("ix_itineraries_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -41,18 +45,21 @@ class Itinerary(Base):
     transport_mode = Column(String, nullable=True)
     interests = Column(JSON, nullable=True)
 
-    plan = Column(JSON, nullable=False)
+    # Stored compressed; see app/compression.py and migrate_plan_storage.py
+    plan = Column(CompressedJSON, nullable=False)
 
-    user = relationship("User", back_populates="itineraries", lazy="joined")
+    user = relationship("User", back_populates="itineraries")
     
-    day_plans = relationship("ItineraryDay", back_populates="itinerary", cascade="all, delete-orphan")
+    day_plans = relationship(
+        "ItineraryDay", back_populates="itinerary", cascade="all, delete-orphan", order_by="ItineraryDay.day_number"
+    )
 
 class ItineraryDay(Base):
     __tablename__ = "itinerary_days"
 
     id = Column(Integer, primary_key=True, index=True)
-    itinerary_id = Column(Integer, ForeignKey("itineraries.id"))
-    
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id"), index=True)
+
     day_number = Column(Integer)
     morning = Column(String)
     afternoon = Column(String)
@@ -60,3 +67,51 @@ class ItineraryDay(Base):
     
     itinerary = relationship("Itinerary", back_populates="day_plans")
 
+
+class CachedItineraryPlan(Base):
+    """Generated plans shared by all workers, keyed by the normalized request hash"""
+    __tablename__ = "itinerary_plan_cache"
+
+    key = Column(String(64), primary_key=True)
+    city = Column(String, index=True, nullable=False)
+    plan = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """Maps a client Idempotency-Key to the itinerary its first request created"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    itinerary = relationship("Itinerary")
+
+
+class ItineraryJob(Base):
+    """Queued itinerary generation, processed by the in-app worker pool (see app/jobs.py)"""
+    __tablename__ = "itinerary_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, index=True)
+    request = Column(JSON, nullable=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+
+    itinerary_id = Column(Integer, ForeignKey("itineraries.id", ondelete="SET NULL"), nullable=True)
+    tier = Column(String(20), nullable=True)  # Engine tier that produced the itinerary
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    itinerary = relationship("Itinerary")
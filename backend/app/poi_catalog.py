@@ -0,0 +1,198 @@
+"""
+Catalog of points of interest used by the local (non-LLM) itinerary planner.
+
+POIs are loaded once from app/data/poi_catalog.json (override with
+POI_CATALOG_PATH). Each one is an attraction or an eatery with a price, a
+category, interest tags, opening hours and (for curated cities) coordinates.
+They are indexed by city, price band and tag, so the planner's lookups are
+dict hits on small lists. Each city's attractions and eateries also get
+column arrays (POIArrays) and a grid index, built once and shared by every
+plan. Cities with no curated entries use the "generic" templates, with
+"{city}" filled in; those have no coordinates.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .geo import GridIndex
+
+POI_CATALOG_PATH = os.getenv(
+    "POI_CATALOG_PATH", os.path.join(os.path.dirname(__file__), "data", "poi_catalog.json")
+)
+
+GENERIC = ""
+
+# (band, highest price in the band), checked in order
+PRICE_BANDS = (("free", 0), ("budget", 150), ("mid", 500), ("premium", float("inf")))
+
+# Substrings of user-facing interests ("Historical Sites", "Nature & Hiking") -> catalog tags
+INTEREST_KEYWORDS = (
+    ("amusement", "amusement"), ("theme park", "amusement"),
+    ("histor", "history"), ("heritage", "history"), ("monument", "history"), ("fort", "history"),
+    ("museum", "museum"), ("beach", "beach"),
+    ("night", "nightlife"), ("party", "nightlife"),
+    ("nature", "nature"), ("hik", "nature"), ("trek", "nature"), ("garden", "nature"), ("wildlife", "nature"),
+    ("food", "food"), ("cuisine", "food"), ("culinary", "food"),
+    ("shop", "shopping"), ("market", "shopping"),
+    ("temple", "spiritual"), ("spiritual", "spiritual"), ("relig", "spiritual"), ("pilgrim", "spiritual"),
+    ("cultur", "culture"), ("arts", "culture"),
+)
+
+
+def price_band(price: int) -> str:
+    for band, ceiling in PRICE_BANDS:
+        if price <= ceiling:
+            return band
+    return PRICE_BANDS[-1][0]
+
+
+def interest_tags(interests: Iterable[str]) -> Set[str]:
+    tags = set()
+    for interest in interests or []:
+        text = interest.lower()
+        for keyword, tag in INTEREST_KEYWORDS:
+            if keyword in text:
+                tags.add(tag)
+    return tags
+
+
+def _norm(name: str) -> str:
+    return " ".join((name or "").lower().split())
+
+
+class POI:
+    __slots__ = ("name", "kind", "category", "price", "tags", "opens", "closes", "band", "lat", "lng")
+
+    def __init__(
+        self, name: str, kind: str, category: str, price: int, tags: Iterable[str], hours=(0, 24), coords=None
+    ):
+        self.name = name
+        self.kind = kind
+        self.category = category
+        self.price = int(price)
+        self.tags = frozenset(tags)
+        self.opens, self.closes = hours
+        self.band = price_band(self.price)
+        self.lat, self.lng = coords if coords else (None, None)
+
+    @property
+    def has_coords(self) -> bool:
+        return self.lat is not None
+
+    def is_open(self, hour: int) -> bool:
+        return self.opens <= hour < self.closes
+
+    def display_name(self, city_name: str) -> str:
+        return self.name.replace("{city}", city_name)
+
+    def __repr__(self):
+        return f"POI({self.name!r}, {self.kind}, {self.category}, ₹{self.price})"
+
+
+class POIArrays:
+    """Column arrays and a grid index over one list of POIs, for the budget optimizer"""
+
+    def __init__(self, pois: List[POI]):
+        self.pois = pois
+        self.positions = {id(poi): i for i, poi in enumerate(pois)}
+        self.prices = np.array([poi.price for poi in pois], dtype=np.float64)
+        self.opens = np.array([poi.opens for poi in pois], dtype=np.float64)
+        self.closes = np.array([poi.closes for poi in pois], dtype=np.float64)
+        self.coords = np.array(
+            [(poi.lat, poi.lng) if poi.has_coords else (np.nan, np.nan) for poi in pois], dtype=np.float64
+        ).reshape(len(pois), 2)
+        self.located_ids = np.flatnonzero(~np.isnan(self.coords[:, 0]))
+        self.index = GridIndex(self.coords[self.located_ids]) if len(self.located_ids) else None
+        self.tag_counts: Dict[str, np.ndarray] = {}
+        for i, poi in enumerate(pois):
+            for tag in poi.tags:
+                self.tag_counts.setdefault(tag, np.zeros(len(pois)))[i] = 1.0
+
+    def __len__(self):
+        return len(self.pois)
+
+    def ids(self, pois: List[POI]) -> np.ndarray:
+        """Positions of pois (all from this list) in the arrays"""
+        return np.array([self.positions[id(poi)] for poi in pois], dtype=np.intp)
+
+
+class POICatalog:
+    def __init__(self, cities: Dict[str, dict], generic: List[dict]):
+        self._keys: Dict[str, str] = {}
+        self._by_kind: Dict[Tuple[str, str], List[POI]] = defaultdict(list)
+        self._by_band: Dict[Tuple[str, str, str], List[POI]] = defaultdict(list)
+        self._by_tag: Dict[Tuple[str, str, str], List[POI]] = defaultdict(list)
+
+        for city_name, entry in cities.items():
+            key = _norm(city_name)
+            for name in [city_name] + entry.get("aliases", []):
+                self._keys[_norm(name)] = key
+            self._add(key, entry["pois"])
+        self._add(GENERIC, generic)
+        self._arrays = {key: POIArrays(pois) for key, pois in self._by_kind.items()}
+
+    def _add(self, key: str, rows: List[dict]):
+        for row in rows:
+            poi = POI(row["name"], row["kind"], row["category"], row["price"], row.get("tags", []),
+                      tuple(row.get("hours", (0, 24))), row.get("coords"))
+            self._by_kind[(key, poi.kind)].append(poi)
+            self._by_band[(key, poi.kind, poi.band)].append(poi)
+            for tag in poi.tags:
+                self._by_tag[(key, poi.kind, tag)].append(poi)
+
+    @classmethod
+    def load(cls, path: str = POI_CATALOG_PATH) -> "POICatalog":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("cities", {}), data.get("generic", []))
+
+    def city_key(self, city_name: str) -> str:
+        """Catalog key for a city (aliases resolve to the curated entry), or GENERIC"""
+        return self._keys.get(_norm(city_name), GENERIC)
+
+    def by_price_band(self, city_name: str, kind: str, bands: Iterable[str]) -> List[POI]:
+        key = self.city_key(city_name)
+        return [poi for band in bands for poi in self._by_band.get((key, kind, band), [])]
+
+    def select(
+        self,
+        city_name: str,
+        kind: str,
+        interests: Iterable[str] = (),
+        max_price: Optional[int] = None,
+        bands: Optional[Iterable[str]] = None,
+    ) -> List[POI]:
+        """POIs of one kind ranked by interest match, keeping catalog order within a rank"""
+        key = self.city_key(city_name)
+        pool = self.by_price_band(city_name, kind, bands) if bands else self._by_kind.get((key, kind), [])
+        if max_price is not None:
+            pool = [poi for poi in pool if poi.price <= max_price]
+
+        scores = defaultdict(int)
+        for tag in interest_tags(interests):
+            for poi in self._by_tag.get((key, kind, tag), []):
+                scores[id(poi)] += 1
+        return sorted(pool, key=lambda poi: -scores[id(poi)])
+
+    def arrays(self, city_name: str, kind: str) -> Optional[POIArrays]:
+        """Prebuilt arrays over every POI of one kind in a city; select() results index into them"""
+        return self._arrays.get((self.city_key(city_name), kind))
+
+
+_catalog: Optional[POICatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> POICatalog:
+    """Process-wide catalog, loaded from disk on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = POICatalog.load()
+    return _catalog
+
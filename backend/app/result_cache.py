@@ -0,0 +1,187 @@
+"""
+Two-tier cache for generated itinerary plans.
+
+Tier 1 is an in-process LRU with a short TTL; tier 2 is the itinerary_plan_cache
+table, which every uvicorn/gunicorn worker shares. Keys are built from a
+normalized request, so equivalent trips hit the same entry. Only Gemini
+results are cached; the local fallback is cheap and is never cached.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas, telemetry
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+# Kept short so invalidations on one worker reach the others quickly
+RESULT_CACHE_MEMORY_TTL_SECONDS = int(os.getenv("RESULT_CACHE_MEMORY_TTL_SECONDS", "600"))
+RESULT_CACHE_DB_TTL_SECONDS = int(os.getenv("RESULT_CACHE_DB_TTL_SECONDS", str(7 * 24 * 3600)))
+# Daily budgets within the same step share cached plans
+RESULT_CACHE_BUDGET_STEP = int(os.getenv("RESULT_CACHE_BUDGET_STEP", "500"))
+
+
+class LRUTTLCache:
+    """Thread-safe LRU map whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_where(self, predicate) -> int:
+        with self._lock:
+            doomed = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_memory = LRUTTLCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MEMORY_TTL_SECONDS)
+_stats_lock = threading.Lock()
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def budget_bucket(budget: int, days: int) -> int:
+    daily_budget = budget // days if days > 0 else budget
+    return daily_budget // max(RESULT_CACHE_BUDGET_STEP, 1)
+
+
+def plan_profile(travel_style: Optional[str], transport_mode: Optional[str], interests) -> dict:
+    """The non-numeric fields the prompt sees, as build_ai_kwargs fills them in.
+
+    Empty fields count as their defaults, so the form's "" and an omitted field
+    share plans. Pace and accommodation aren't in the prompt and are left out.
+    """
+    return {
+        "travel_style": _norm(travel_style or schemas.DEFAULT_TRAVEL_STYLE),
+        "transport_mode": _norm(transport_mode or schemas.DEFAULT_TRANSPORT_MODE),
+        "interests": sorted({_norm(i) for i in (interests or []) if _norm(i)}),
+    }
+
+
+def make_cache_key(itinerary_in: schemas.ItineraryRequest, city_name: str) -> str:
+    """Hash of the request fields that change the generated plan"""
+    normalized = {
+        "city": _norm(city_name),
+        "days": itinerary_in.days,
+        "budget_bucket": budget_bucket(itinerary_in.budget, itinerary_in.days),
+        **plan_profile(itinerary_in.travelStyle, itinerary_in.transportMode, itinerary_in.interests),
+    }
+    raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_plan(db: Session, key: str) -> Optional[list]:
+    """Return a cached plan from memory or the shared table, or None on miss"""
+    if not RESULT_CACHE_ENABLED:
+        return None
+
+    entry = _memory.get(key)
+    if entry is not None:
+        _count("memory_hits")
+        telemetry.record_cache_lookup("memory_hit")
+        return entry["plan"]
+
+    row = db.query(models.CachedItineraryPlan).filter(models.CachedItineraryPlan.key == key).first()
+    if row and row.created_at >= datetime.utcnow() - timedelta(seconds=RESULT_CACHE_DB_TTL_SECONDS):
+        _memory.set(key, {"city": row.city, "plan": row.plan})
+        _count("db_hits")
+        telemetry.record_cache_lookup("db_hit")
+        return row.plan
+
+    _count("misses")
+    telemetry.record_cache_lookup("miss")
+    return None
+
+
+def store_plan(db: Session, key: str, city_name: str, plan: list):
+    """Write a freshly generated plan to both tiers"""
+    if not RESULT_CACHE_ENABLED:
+        return
+
+    _memory.set(key, {"city": city_name, "plan": plan})
+
+    row = db.query(models.CachedItineraryPlan).filter(models.CachedItineraryPlan.key == key).first()
+    if row:
+        row.plan = plan
+        row.created_at = datetime.utcnow()
+    else:
+        db.add(models.CachedItineraryPlan(key=key, city=city_name, plan=plan))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same key first; its plan is just as good
+        db.rollback()
+    _count("stores")
+
+
+def invalidate(db: Session, city: Optional[str] = None) -> int:
+    """Drop cached plans for one city, ignoring case (or all of them); returns rows removed from the shared tier"""
+    query = db.query(models.CachedItineraryPlan)
+    if city:
+        query = query.filter(func.lower(models.CachedItineraryPlan.city) == _norm(city))
+    removed = query.delete(synchronize_session=False)
+    db.commit()
+    # After the commit, so a concurrent lookup can't refill memory from rows about to be deleted
+    if city:
+        _memory.delete_where(lambda entry: _norm(entry["city"]) == _norm(city))
+    else:
+        _memory.clear()
+    _count("invalidations")
+    return removed
+
+
+def cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0.0
+    stats["memory_entries"] = len(_memory)
+    stats["enabled"] = RESULT_CACHE_ENABLED
+    return stats
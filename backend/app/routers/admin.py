@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import APIRouter, Request
+
+from .. import crud, database, itinerary_engine
+from ..model_health import model_health
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+# -------- Gemini model health --------
+@router.get("/models")
+def get_model_health():
+    return {"models": model_health.snapshot(crud.GEMINI_MODELS)}
+
+
+@router.post("/models/reset")
+def reset_model_health(model: Optional[str] = None):
+    # Closes the breaker (or re-enables a 404'd model) without a restart
+    model_health.reset(model)
+    return {"models": model_health.snapshot(crud.GEMINI_MODELS)}
+
+
+# -------- Itinerary engine --------
+@router.get("/engine")
+def get_engine():
+    # Per-tier latency estimates, as used to pick a tier for each request's budget
+    return itinerary_engine.engine_snapshot()
+
+
+# -------- Database pools --------
+@router.get("/db/pool")
+def get_pool_stats():
+    # Checkout wait times are in the tripcraft_db_pool_wait_seconds metric
+    return database.pool_stats()
+
+
+# -------- Startup --------
+@router.get("/startup")
+def get_startup_report(request: Request):
+    # Import and lifespan step timings of this worker process
+    return getattr(request.app.state, "startup", None)
@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas import CityResponse
-from app import crud
+from fastapi import APIRouter, Query, Request
+from app.schemas import CityResolution, CityResponse, CitySuggestion
+from app import city_index, city_list
 
 router = APIRouter(prefix="/api/cities", tags=["Cities"])
 
 @router.get("/", response_model=list[CityResponse])
-def fetch_cities(db: Session = Depends(get_db)):
-    return crud.get_cities(db)
+async def fetch_cities(request: Request):
+    # Cached bytes with an ETag; see app/city_list.py
+    return await city_list.respond(request)
+
+
+@router.get("/search", response_model=list[CitySuggestion])
+def search_cities(
+    q: str = Query("", max_length=100),
+    limit: int = Query(8, ge=1, le=city_index.SEARCH_LIMIT_MAX)
+):
+    # Autocomplete from the in-memory index; no database round trip
+    return city_index.search(q, limit)
+
+
+@router.get("/resolve", response_model=CityResolution)
+def resolve_city(q: str = Query(..., min_length=1, max_length=100)):
+    # Free text -> canonical city, with "did you mean" suggestions when unsure
+    return city_index.resolve(q).as_dict()
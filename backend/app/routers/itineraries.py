@@ -1,9 +1,13 @@
+import json
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from .. import schemas, crud, models
+from ..database import get_db, get_async_read_db
+from .. import database
+from .. import schemas, crud, models, result_cache, jobs, itinerary_engine, city_list
 from ..auth import get_current_user
 
 router = APIRouter(prefix="/api/itineraries", tags=["Itineraries"])
@@ -11,9 +15,9 @@ router = APIRouter(prefix="/api/itineraries", tags=["Itineraries"])
 
 # -------- Cities --------
 @router.get("/cities", response_model=List[schemas.CityOut])
-def get_cities(db: Session = Depends(get_db)):
-    cities = crud.get_cities(db)
-    return cities
+async def get_cities(request: Request):
+    # Same cached body as /api/cities/
+    return await city_list.respond(request)
 
 
 @router.post("/cities", response_model=schemas.CityOut, status_code=status.HTTP_201_CREATED)
@@ -24,27 +28,102 @@ def create_city(city: schemas.CityCreate, db: Session = Depends(get_db)):
     return crud.create_city(db, city)
 
 
+# -------- Plan cache --------
+@router.get("/cache/stats")
+def get_cache_stats():
+    return result_cache.cache_stats()
+
+
+@router.delete("/cache")
+def invalidate_cache(city: Optional[str] = None, db: Session = Depends(get_db)):
+    removed = result_cache.invalidate(db, city)
+    return {"invalidated": removed, "city": city}
+
+
 # -------- Itineraries --------
 
 @router.post("/", response_model=schemas.ItineraryOut)
-def create_itinerary(
+async def create_itinerary(
     itinerary_in: schemas.ItineraryRequest, 
-    db: Session = Depends(get_db),
+    response: Response,
     # For now, we'll use a hardcoded user_id if you haven't built the 'get_current_user' dependency yet.
     # If you have JWT auth ready, replace 1 with the actual user ID.
-    user_id: int = 1 
+    user_id: int = 1,
+    # Retries carrying the same key return the itinerary stored by the first attempt
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    # How long the caller is willing to wait; tiers that can't answer in time are skipped
+    latency_budget_ms: Optional[int] = Query(None, ge=0),
+    x_latency_budget_ms: Optional[int] = Header(None, ge=0)
 ):
-    return crud.create_itinerary(db, itinerary_in, user_id)
+    # async so slow Gemini calls don't tie up the threadpool serving other routes
+    budget_ms = latency_budget_ms if latency_budget_ms is not None else x_latency_budget_ms
+    itinerary = await itinerary_engine.create_itinerary(itinerary_in, user_id, idempotency_key, budget_ms)
+    response.headers["X-Itinerary-Tier"] = itinerary.tier
+    return itinerary
+
+async def _sse(events):
+    try:
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        print(f"❌ Itinerary stream failed: {e}")
+        yield f"event: error\ndata: {json.dumps({'detail': 'Itinerary generation failed'})}\n\n"
+
+
+@router.post("/stream")
+async def stream_itinerary(
+    itinerary_in: schemas.ItineraryRequest,
+    user_id: int = 1
+):
+    """Server-Sent Events variant of create_itinerary: each day is sent as soon as it's generated"""
+    events = await itinerary_engine.start_itinerary_stream(itinerary_in, user_id)
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# -------- Background jobs (202 + poll) --------
+@router.post("/jobs", response_model=schemas.ItineraryJobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_itinerary_job(
+    itinerary_in: schemas.ItineraryRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    user_id: int = 1
+):
+    job = jobs.enqueue_job(db, itinerary_in, user_id)
+    jobs.worker_pool.notify()
+    response.headers["Location"] = f"{router.prefix}/jobs/{job.id}"
+    return jobs.job_to_out(job)
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.ItineraryJobOut)
+def get_itinerary_job(job_id: int, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_to_out(job)
 
 @router.get("/{itinerary_id}", response_model=schemas.ItineraryOut)
-def get_itinerary(itinerary_id: int, db: Session = Depends(get_db)):
-    db_itinerary = crud.get_itinerary(db, itinerary_id)
+async def get_itinerary(itinerary_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    db_itinerary = await crud.get_itinerary_async(db, itinerary_id)
+    if not db_itinerary and database.DATABASE_REPLICA_URLS:
+        # Possibly created moments ago and not on this replica yet
+        async with database.get_async_sessionmaker()() as primary:
+            db_itinerary = await crud.get_itinerary_async(primary, itinerary_id)
     if not db_itinerary:
         raise HTTPException(status_code=404, detail="Itinerary not found")
     return db_itinerary
 
-# 3. LIST Itineraries (Optional, useful for history)
-@router.get("/", response_model=List[schemas.ItineraryOut])
-def list_itineraries(db: Session = Depends(get_db)):
-    # You can expand this to filter by user_id later
-    return crud.list_itineraries(db)
\ No newline at end of file
+# 3. LIST Itineraries (history, newest first)
+@router.get("/", response_model=schemas.ItineraryPage)
+async def list_itineraries(
+    user_id: Optional[int] = None,
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=crud.ITINERARY_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if user_id is not None and database.recent_writes.active(user_id):
+        # Read-your-writes: a replica may not have this user's new itinerary yet
+        database.pin_primary(db)
+    return await crud.list_itineraries_async(db, user_id, cursor, limit)
\ No newline at end of file
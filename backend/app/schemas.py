@@ -1,5 +1,6 @@
+from datetime import datetime
 from typing import List, Optional,Any
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 # ---------- City ----------
 class CityBase(BaseModel):
@@ -22,6 +23,18 @@ class CityOut(CityBase):
         from_attributes = True
 
 
+class CitySuggestion(BaseModel):
+    id: int
+    name: str
+
+
+class CityResolution(BaseModel):
+    city: Optional[CitySuggestion] = None
+    # exact | normalized | alias | fuzzy; None when nothing matched clearly
+    match: Optional[str] = None
+    suggestions: List[CitySuggestion] = []
+
+
 # ---------- User ----------
 class UserCreate(BaseModel):
     name: str
@@ -61,24 +74,39 @@ class ItineraryDayCreate(ItineraryDayBase):
 
 
 class ItineraryDayOut(ItineraryDayBase):
-    id: int
+    id: Optional[int] = None            # None when the day only lives in the plan JSON
     
     class Config:
         from_attributes = True
 
 
 # ---------- Itinerary Request (Input from Frontend) ----------
+# What the planner assumes when a field is left empty
+DEFAULT_TRAVEL_STYLE = "mid-range"
+DEFAULT_TRANSPORT_MODE = "public transport"
+# Longest trip accepted: bounds the Gemini fan-out and the local planner's work per request
+MAX_TRIP_DAYS = 30
+
+
 class ItineraryRequest(BaseModel):
     city: str
-    days: int
+    days: int = Field(ge=1, le=MAX_TRIP_DAYS)
     budget: int
-    travelStyle: Optional[str] = "mid-range"
+    travelStyle: Optional[str] = DEFAULT_TRAVEL_STYLE
     accommodation: Optional[str] = "hotel"
     pace: Optional[str] = "moderate"
-    transportMode: Optional[str] = "public transport"
+    transportMode: Optional[str] = DEFAULT_TRANSPORT_MODE
     interests: Optional[List[str]] = []
 
 
+# ---------- AI Day (structured Gemini output) ----------
+class AIDayPlan(BaseModel):
+    day: int
+    morning: str
+    afternoon: str
+    evening: str
+
+
 # ---------- Itinerary Response (Full details) ----------
 class ItineraryOut(BaseModel):
     id: int
@@ -92,10 +120,26 @@ class ItineraryOut(BaseModel):
     interests: Optional[List[str]] = []
     plan: Optional[Any] = None          # Raw AI JSON
     day_plans: List[ItineraryDayOut] = []  # Structured days from relationship
-    
+    tier: Optional[str] = None          # Engine tier that produced the plan (create responses only)
+
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def days_from_plan(self):
+        # Itineraries stored without day rows (ITINERARY_DAY_ROWS=false)
+        if not self.day_plans and isinstance(self.plan, list):
+            self.day_plans = [
+                ItineraryDayOut(
+                    day_number=day.get("day", number),
+                    morning=day.get("morning"),
+                    afternoon=day.get("afternoon"),
+                    evening=day.get("evening"),
+                )
+                for number, day in enumerate(self.plan, start=1) if isinstance(day, dict)
+            ]
+        return self
+
 
 # ---------- Itinerary List (For listing - lighter response) ----------
 class ItineraryListOut(BaseModel):
@@ -107,4 +151,26 @@ class ItineraryListOut(BaseModel):
     accommodation: Optional[str] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ItineraryPage(BaseModel):
+    items: List[ItineraryListOut]
+    next_cursor: Optional[int] = None   # Pass as ?cursor= for the next page; None on the last page
+
+
+# ---------- Itinerary Job (202 + poll) ----------
+class ItineraryJobOut(BaseModel):
+    id: int
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    itinerary_id: Optional[int] = None
+    tier: Optional[str] = None          # Engine tier that produced the itinerary
+    created_at: datetime
+    updated_at: datetime
+    itinerary: Optional[ItineraryOut] = None  # Filled in once the job has succeeded
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,43 @@
+"""
+Single-flight coalescing for async work.
+
+Concurrent callers asking for the same key share one in-flight task and all
+receive its result (or its exception). The entry is dropped once the task
+finishes, so later callers start fresh work.
+
+A caller may pass a token describing its request. Joining a flight that was
+started with a different token raises FlightConflict instead of handing back
+the other request's result.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class FlightConflict(Exception):
+    pass
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, Tuple[asyncio.Task, Optional[Hashable]]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable], token: Optional[Hashable] = None):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = (task, token)
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            task, flight_token = entry
+            if flight_token != token:
+                raise FlightConflict(key)
+        # shield: one waiter disconnecting must not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    def __len__(self):
+        return len(self._inflight)
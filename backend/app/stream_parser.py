@@ -0,0 +1,63 @@
+"""
+Incremental parser for a streamed JSON array of objects.
+
+Gemini streams the day list as arbitrary text fragments. feed() accepts each
+fragment and returns the top-level objects that closed in it, so days can be
+forwarded as soon as they are complete. Anything before the opening '[' (e.g.
+a ```json fence) is ignored.
+"""
+import json
+from typing import List
+
+
+class JsonArrayStreamParser:
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_chars = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> List[dict]:
+        completed = []
+        for ch in text or "":
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._object_chars is not None:
+                self._object_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._object_chars = [ch]
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_chars is not None:
+                    obj = json.loads("".join(self._object_chars))
+                    self._object_chars = None
+                    if isinstance(obj, dict):
+                        completed.append(obj)
+            elif ch == "]" and self._depth == 0:
+                self._finished = True
+        return completed
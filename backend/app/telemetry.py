@@ -0,0 +1,174 @@
+"""
+Lightweight metrics and structured logs for the itinerary generation pipeline.
+
+Metrics are kept in-process and rendered in the Prometheus text format at
+GET /metrics (no prometheus_client dependency). With several workers, each
+process exposes its own numbers, and the scraper aggregates them. Events are
+also written as one JSON object per line to the "tripcraft.telemetry" logger.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+TELEMETRY_LOGS_ENABLED = os.getenv("TELEMETRY_LOGS_ENABLED", "true").lower() == "true"
+
+# Seconds; LLM calls range from sub-second cache-like replies to the 30s deadline
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+# Seconds; a healthy pool hands out connections in well under a millisecond
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10)
+
+_lock = threading.Lock()
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: Tuple, extra: Optional[Tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+# -------- Metrics --------
+GEMINI_LATENCY = Histogram(
+    "tripcraft_gemini_request_seconds", "Gemini call latency by model and outcome")
+GEMINI_PROMPT_TOKENS = Counter(
+    "tripcraft_gemini_prompt_tokens_total", "Prompt tokens sent to Gemini")
+GEMINI_RESPONSE_TOKENS = Counter(
+    "tripcraft_gemini_response_tokens_total", "Response tokens received from Gemini")
+GEMINI_ERRORS = Counter(
+    "tripcraft_gemini_errors_total", "Gemini call failures by model and class (quota/not_found/invalid_output/error)")
+PLANS = Counter(
+    "tripcraft_itinerary_plans_total", "Itinerary plans by source (ai/cache/fallback/partial)")
+PLAN_LATENCY = Histogram(
+    "tripcraft_itinerary_plan_seconds", "Time to produce a plan (before persistence) by source")
+CACHE_LOOKUPS = Counter(
+    "tripcraft_result_cache_lookups_total", "Result cache lookups by outcome (memory_hit/db_hit/miss)")
+BUDGET_REPAIRS = Counter(
+    "tripcraft_budget_repaired_days_total", "Generated days replaced because their costs went over budget")
+DB_POOL_WAIT = Histogram(
+    "tripcraft_db_pool_wait_seconds", "Time to check a connection out of the pool by engine (sync/async)",
+    buckets=POOL_WAIT_BUCKETS)
+
+ALL_METRICS = [
+    GEMINI_LATENCY, GEMINI_PROMPT_TOKENS, GEMINI_RESPONSE_TOKENS, GEMINI_ERRORS,
+    PLANS, PLAN_LATENCY, CACHE_LOOKUPS, BUDGET_REPAIRS, DB_POOL_WAIT,
+]
+
+
+def render_metrics() -> str:
+    lines = []
+    with _lock:
+        for metric in ALL_METRICS:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------- Structured logs --------
+logger = logging.getLogger("tripcraft.telemetry")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event: str, **fields):
+    if TELEMETRY_LOGS_ENABLED:
+        logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
+
+
+# -------- Recording helpers --------
+def record_gemini_call(model: str, seconds: float, outcome: str, usage=None):
+    """outcome is "success", "cancelled" or an error class from model_health.classify_error"""
+    GEMINI_LATENCY.observe(seconds, model=model, outcome=outcome)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+    response_tokens = getattr(usage, "candidates_token_count", None) or 0
+    if prompt_tokens:
+        GEMINI_PROMPT_TOKENS.inc(prompt_tokens, model=model)
+    if response_tokens:
+        GEMINI_RESPONSE_TOKENS.inc(response_tokens, model=model)
+    if outcome not in ("success", "cancelled"):
+        GEMINI_ERRORS.inc(model=model, kind=outcome)
+    log_event(
+        "gemini_call", model=model, outcome=outcome, latency_ms=round(seconds * 1000, 1),
+        prompt_tokens=prompt_tokens, response_tokens=response_tokens
+    )
+
+
+def record_plan(source: str, seconds: float, city: str, days: int):
+    PLANS.inc(source=source)
+    PLAN_LATENCY.observe(seconds, source=source)
+    log_event("itinerary_plan", source=source, latency_ms=round(seconds * 1000, 1), city=city, days=days)
+
+
+def record_cache_lookup(outcome: str):
+    CACHE_LOOKUPS.inc(outcome=outcome)
+
+
+def record_budget_repair(days: int):
+    BUDGET_REPAIRS.inc(days)
+    log_event("budget_repair", days=days)
+
+
+def record_pool_wait(engine: str, seconds: float):
+    # Per checkout, so metrics only; logging each one would swamp the event log
+    DB_POOL_WAIT.observe(seconds, engine=engine)
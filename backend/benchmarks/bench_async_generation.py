@@ -0,0 +1,106 @@
+"""
+Benchmark: itinerary generation throughput vs. concurrency, and /health latency under load.
+
+Runs the FastAPI app in-process against a throwaway SQLite database with a fake
+Gemini client that sleeps for GEMINI_FAKE_LATENCY seconds per call, so no quota
+is used.
+
+Usage (from backend/):
+    pip install httpx
+    python benchmarks/bench_async_generation.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+# Every request should pay for a generation
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal, create_schema  # noqa: E402
+from app.main import app  # noqa: E402
+
+FAKE_LATENCY = float(os.getenv("GEMINI_FAKE_LATENCY", "1.0"))
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+FAKE_PLAN = '[{"day": 1, "morning": "Fort (₹50)", "afternoon": "Lunch (₹200)", "evening": "Market (₹0)"}]'
+
+
+class FakeAsyncModels:
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(FAKE_LATENCY)
+        return SimpleNamespace(text=FAKE_PLAN)
+
+
+def install_fake_client():
+    crud.gemini_client = SimpleNamespace(aio=SimpleNamespace(models=FakeAsyncModels()))
+
+
+def seed():
+    # ASGITransport doesn't run the lifespan, which normally creates the schema
+    create_schema()
+    db = SessionLocal()
+    if not db.query(models.City).filter(models.City.name == "Delhi").first():
+        db.add(models.City(name="Delhi", country="India"))
+        db.commit()
+    db.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def probe_health(client, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)
+
+
+async def run_level(client, concurrency):
+    health_latencies = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe_health(client, stop, health_latencies))
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        # Distinct budgets so requests don't coalesce or hit the plan cache
+        client.post("/api/itineraries/", json={"city": "Delhi", "days": 1, "budget": 5000 + 1000 * i})
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await prober
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(
+        f"{concurrency:>5} | {ok:>4} | {elapsed:>8.2f}s | {ok / elapsed:>8.2f} req/s | "
+        f"{percentile(health_latencies, 50):>7.1f}ms | {percentile(health_latencies, 95):>7.1f}ms"
+    )
+
+
+async def main():
+    seed()
+    install_fake_client()
+    print(f"Fake Gemini latency: {FAKE_LATENCY}s, GEMINI_MAX_CONCURRENCY={crud.GEMINI_MAX_CONCURRENCY}")
+    print("concurrency |   ok |  elapsed | throughput | health p50 | health p95")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in CONCURRENCY_LEVELS:
+            await run_level(client, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark: requests per second for the full city list, before and after caching.
+
+Seeds a SQLite database with CITIES cities and sends REQUESTS sequential
+requests through httpx's ASGI transport (no network) for each case:
+  query      the previous route: crud.get_cities + response_model validation
+  cached     GET /api/cities/ with Accept-Encoding: gzip (pre-compressed bytes)
+  identity   GET /api/cities/ without compression
+  304        GET /api/cities/ with a matching If-None-Match
+Bytes are the body as sent (Content-Length); httpx's gunzip is in the timings.
+
+Usage (from backend/):
+    python benchmarks/bench_city_list.py [REQUESTS] [CITIES]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.database import SessionLocal, create_schema, get_read_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/api/cities/", response_model=list[schemas.CityResponse])
+def legacy_fetch_cities(db: Session = Depends(get_read_db)):
+    return crud.get_cities(db)
+
+
+def seed(count: int):
+    # ASGITransport doesn't run the lifespan, which normally creates the schema
+    create_schema()
+    db = SessionLocal()
+    db.execute(insert(models.City), [{"name": f"City {i:05d}", "country": "India"} for i in range(count)])
+    db.commit()
+    db.close()
+
+
+async def run(target, requests: int, headers: dict) -> tuple:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm-up, which also builds the cached snapshot
+        response = await client.get("/api/cities/", headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/api/cities/", headers=headers)
+        elapsed = time.perf_counter() - start
+    sent = int(response.headers.get("content-length", 0))
+    return requests / elapsed, response.status_code, sent, response.headers.get("etag")
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    cities = int(sys.argv[2]) if len(sys.argv) > 2 else 3700
+    seed(cities)
+
+    _, _, _, etag = await run(app, 1, {"Accept-Encoding": "gzip"})
+    cases = [
+        ("query", legacy_app, {"Accept-Encoding": "identity"}),
+        ("cached", app, {"Accept-Encoding": "gzip"}),
+        ("identity", app, {"Accept-Encoding": "identity"}),
+        ("304", app, {"Accept-Encoding": "gzip", "If-None-Match": etag}),
+    ]
+    print(f"{cities} cities, {requests} requests per case")
+    print(f"{'case':<8} | {'req/s':>8} | {'status':>6} | {'bytes':>7}")
+    for name, target, headers in cases:
+        rate, status, size, _ = await run(target, requests, headers)
+        print(f"{name:<8} | {rate:>8.0f} | {status:>6} | {size:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark: resolving free-text city names to canonical cities.
+
+Seeds a SQLite database with every Indian city in geonamescache (needed here,
+for the names and their aliases), builds the city index, then times
+city_index.resolve on:
+  exact     every city name as stored
+  spaced    names in lowercase with extra spaces
+  alias     the renames in ALIAS_GROUPS ("Bombay", "Bangalore", ...)
+  typo      names with one letter dropped, swapped or doubled
+For each set it reports microseconds per lookup and how many lookups resolved
+to the intended city, resolved to another city, or came back as suggestions.
+
+Usage (from backend/):
+    pip install geonamescache
+    python benchmarks/bench_city_resolve.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+
+import geonamescache  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import city_index, models  # noqa: E402
+from app.database import SessionLocal, create_schema  # noqa: E402
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.choice(("drop", "swap", "double"))
+    if kind == "drop":
+        return name[:i] + name[i + 1:]
+    if kind == "swap":
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + name[i] + name[i:]
+
+
+def run(index, cases) -> dict:
+    start = time.perf_counter()
+    results = [index.resolve(query) for query, _ in cases]
+    elapsed = time.perf_counter() - start
+    right = sum(1 for r, (_, want) in zip(results, cases) if r.city and r.city["name"] == want)
+    wrong = sum(1 for r, (_, want) in zip(results, cases) if r.city and r.city["name"] != want)
+    return {"us": elapsed * 1e6 / len(cases), "right": right, "wrong": wrong, "suggested": len(cases) - right - wrong}
+
+
+def main():
+    create_schema()
+    cities = geonamescache.GeonamesCache().get_cities().values()
+    names = sorted({c["name"] for c in cities if c["countrycode"] == "IN"})
+    db = SessionLocal()
+    db.execute(insert(models.City), [{"name": name, "country": "India"} for name in names])
+    db.commit()
+
+    start = time.perf_counter()
+    city_index.load_geonames()
+    index = city_index.refresh(db)
+    db.close()
+    print(f"{len(index)} cities, {len(index.aliases)} aliases; geonames + build {time.perf_counter() - start:.2f} s")
+
+    rng = random.Random(0)
+    present = set(names)
+    renames = [(old, group[0]) for group in city_index.ALIAS_GROUPS if group[0] in present for old in group[1:]]
+    sets = {
+        "exact": [(name, name) for name in names],
+        "spaced": [(f"  {name.lower()} ", name) for name in names],
+        "alias": renames,
+        # Only names that stay unique after folding, so the intended city is well defined
+        "typo": [(typo(name, rng), name) for name in names
+                 if len(name) >= 5 and len(index.squashed[city_index.squash(name)]) == 1],
+    }
+    print(f"{'set':<7} | {'lookups':>7} | {'us/lookup':>9} | {'right':>5} | {'wrong':>5} | {'suggested':>9}")
+    for label, cases in sets.items():
+        stats = run(index, cases)
+        print(f"{label:<7} | {len(cases):>7} | {stats['us']:>9.1f} | {stats['right']:>5} | "
+              f"{stats['wrong']:>5} | {stats['suggested']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: city autocomplete with the prefix index vs filtering the full list.
+
+Seeds a SQLite database with every Indian city in geonamescache (like
+seed_cities.py), or with generated names if it isn't installed. Then it
+compares, per keystroke:
+  scan   what PlanTrip.jsx did: a substring filter over every city name
+  index  city_index.search: a bisect over the sorted name array, top LIMIT
+Queries are prefixes of 1-6 letters of random city names. Payload is the JSON
+body the browser downloads: the full /api/cities/ list vs one search result.
+
+Usage (from backend/):
+    pip install geonamescache
+    python benchmarks/bench_city_search.py [QUERIES]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import city_index, crud, models, schemas  # noqa: E402
+from app.database import SessionLocal, create_schema  # noqa: E402
+
+LIMIT = 8
+
+
+def city_names() -> list:
+    try:
+        import geonamescache
+    except ImportError:
+        rng = random.Random(0)
+        syllables = ("pur", "ab", "ad", "gar", "h", "na", "ko", "ta", "ma", "ri", "van", "del", "ji", "bad")
+        return sorted({"".join(rng.choices(syllables, k=rng.randint(2, 4))).title() for _ in range(4000)})
+    cities = geonamescache.GeonamesCache().get_cities().values()
+    return sorted({c["name"] for c in cities if c["countrycode"] == "IN"})
+
+
+def seed(db, names: list):
+    db.execute(insert(models.City), [{"name": name, "country": "India"} for name in names])
+    # Some planning history, so popularity matters in the ranking
+    rng = random.Random(1)
+    db.execute(insert(models.Itinerary), [
+        {"user_id": 1, "city": rng.choice(names[:200]), "days": 2, "budget": 5000, "plan": []} for _ in range(500)
+    ])
+    db.commit()
+
+
+def per_query_us(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    create_schema()
+    names = city_names()
+    db = SessionLocal()
+    seed(db, names)
+
+    start = time.perf_counter()
+    city_index.load_geonames()
+    geonames_ms = (time.perf_counter() - start) * 1000
+    city_index.load_popularity(db)
+    start = time.perf_counter()
+    index = city_index.refresh(db)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    full = [schemas.CityResponse.model_validate(c).model_dump() for c in crud.get_cities(db)]
+    db.close()
+    lowered = [(c["name"].lower(), c) for c in full]
+
+    rng = random.Random(2)
+    queries = []
+    for _ in range(count):
+        name = rng.choice(names)
+        queries.append(name[:rng.randint(1, min(6, len(name)))])
+
+    scan = lambda q: [c for name, c in lowered if q.lower() in name]  # noqa: E731
+    search = lambda q: index.search(q, LIMIT)  # noqa: E731
+    full_bytes = len(json.dumps(full))
+    result_bytes = sum(len(json.dumps(search(q))) for q in queries[:1000]) / min(1000, len(queries))
+
+    print(f"{len(index)} cities; geonames loaded in {geonames_ms:.0f} ms, index built in {build_ms:.1f} ms")
+    print(f"{'method':<6} | {'us/query':>8} | {'payload B':>9}")
+    print(f"{'scan':<6} | {per_query_us(scan, queries):>8.1f} | {full_bytes:>9}")
+    print(f"{'index':<6} | {per_query_us(search, queries):>8.1f} | {result_bytes:>9.0f}")
+    for query in ("de", "mum", "ban", "hyd"):
+        print(f"  {query!r}: {[c['name'] for c in search(query)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: cold start to first response.
+
+Each run starts a fresh `uvicorn app.main:app` process against a new SQLite
+file and polls GET /health until it answers. The time from spawning the
+process to the first 200 is the cold start. Also reports how long a bare
+`import app.main` takes, and whether the app can be imported with no
+DATABASE_URL at all.
+
+Usage (from backend/):
+    python benchmarks/bench_cold_start.py [RUNS]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fresh_env(database: bool = True) -> dict:
+    env = {**os.environ, "TELEMETRY_LOGS_ENABLED": "false", "PYTHONDONTWRITEBYTECODE": "1"}
+    env.pop("DATABASE_URL", None)
+    if database:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold.db')}"
+    return env
+
+
+def cold_start_ms() -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=fresh_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("server exited before answering")
+            time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_ms(database: bool = True):
+    code = "import time; s = time.perf_counter(); import app.main; print((time.perf_counter() - s) * 1000)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND, env=fresh_env(database), capture_output=True, text=True
+    )
+    return float(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    starts = [cold_start_ms() for _ in range(runs)]
+    imports = [import_ms() for _ in range(runs)]
+    print(f"cold start to first /health: median {statistics.median(starts):.0f} ms "
+          f"(min {min(starts):.0f}, max {max(starts):.0f}, {runs} runs)")
+    print(f"import app.main:             median {statistics.median(imports):.0f} ms")
+    without_db = import_ms(database=False)
+    print("import without DATABASE_URL: " + (f"ok ({without_db:.0f} ms)" if without_db is not None else "fails"))
+
+
+if __name__ == "__main__":
+    main()
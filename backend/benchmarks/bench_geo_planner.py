@@ -0,0 +1,111 @@
+"""
+Benchmark: geo-aware local planner on large synthetic POI sets.
+
+For each catalog size, generates a city of random POIs (about 30 x 30 km) and
+plans a DAYS-day trip twice with budget_optimizer.optimize_days. The first run
+strips coordinates, which is the planner without clustering or routing. The
+second run uses them. Reports mean travel per day and planning time. Also times
+the geo building blocks: GridIndex lookups against a full scan, balanced k-means
+and route ordering.
+
+Usage (from backend/):
+    python benchmarks/bench_geo_planner.py [DAYS]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import geo  # noqa: E402
+from app.budget_optimizer import optimize_days, travel_km  # noqa: E402
+from app.poi_catalog import POI  # noqa: E402
+
+SIZES = (100, 1000, 5000)
+TAGS = ("history", "museum", "nature", "food", "shopping", "spiritual", "nightlife")
+CENTER = (28.61, 77.21)
+
+
+def synthetic_city(size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    coords = np.column_stack([
+        CENTER[0] + rng.uniform(-0.135, 0.135, size), CENTER[1] + rng.uniform(-0.15, 0.15, size)
+    ])
+    pois = []
+    for i, (lat, lng) in enumerate(coords):
+        kind = "eatery" if i % 3 == 0 else "attraction"
+        opens = int(rng.integers(5, 11))
+        pois.append(POI(
+            f"{kind} {i}", kind, "restaurant" if kind == "eatery" else "monument",
+            int(rng.integers(50, 600)) if kind == "eatery" else int(rng.choice([0, 0, 20, 50, 200, 500])),
+            rng.choice(TAGS, size=2, replace=False).tolist() + (["food"] if kind == "eatery" else []),
+            (opens, int(rng.integers(18, 25))), (float(lat), float(lng)),
+        ))
+    return pois
+
+
+def strip_coords(pois):
+    return [POI(p.name, p.kind, p.category, p.price, p.tags, (p.opens, p.closes)) for p in pois]
+
+
+def mean_travel(plan, by_name) -> float:
+    """Mean km/day, measured on the real coordinates whatever the planner saw"""
+    slots = ("breakfast", "morning", "lunch", "afternoon", "dinner", "evening")
+    return float(np.mean([travel_km([by_name[day[s].name] for s in slots if day[s]]) or 0 for day in plan]))
+
+
+def timed(fn, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def bench_planner(days: int):
+    print(f"Planner, {days}-day trip (daily activities ₹750, food ₹750)")
+    print(f"{'POIs':>6} | {'km/day plain':>12} | {'km/day geo':>10} | {'ms plain':>8} | {'ms geo':>7}")
+    for size in SIZES:
+        pois = synthetic_city(size)
+        by_name = {p.name: p for p in pois}
+        sights = [p for p in pois if p.kind == "attraction"]
+        eateries = [p for p in pois if p.kind == "eatery"]
+        plain_sights, plain_eateries = strip_coords(sights), strip_coords(eateries)
+
+        plain, plain_ms = timed(lambda: optimize_days("X", plain_sights, plain_eateries, ["history"], days, 750, 750))
+        spatial, geo_ms = timed(lambda: optimize_days("X", sights, eateries, ["history"], days, 750, 750))
+        print(
+            f"{size:>6} | {mean_travel(plain, by_name):>12.1f} | {mean_travel(spatial, by_name):>10.1f} | "
+            f"{plain_ms:>8.1f} | {geo_ms:>7.1f}"
+        )
+
+
+def bench_building_blocks():
+    print("\nBuilding blocks")
+    rng = np.random.default_rng(1)
+    for size in SIZES:
+        points = np.array([(p.lat, p.lng) for p in synthetic_city(size)])
+        queries = points[rng.integers(size, size=500)] + 0.002
+        index, build_ms = timed(lambda: geo.GridIndex(points), repeat=1)
+        _, grid_ms = timed(lambda: [index.nearest(lat, lng, 5) for lat, lng in queries])
+        _, scan_ms = timed(lambda: [
+            np.argsort(geo.haversine_km(lat, lng, points[:, 0], points[:, 1]))[:5] for lat, lng in queries
+        ])
+        _, kmeans_ms = timed(lambda: geo.balanced_kmeans(points, 30), repeat=1)
+        route_points = points[:min(size, 300)]
+        order, route_ms = timed(lambda: geo.route_order(route_points), repeat=1)
+        print(
+            f"{size:>6} POIs | index build {build_ms:6.1f} ms | 500 x 5-NN grid {grid_ms:6.1f} ms "
+            f"vs scan {scan_ms:6.1f} ms | k-means (k=30) {kmeans_ms:7.1f} ms | "
+            f"route {len(route_points)} stops {route_ms:6.1f} ms "
+            f"({geo.path_km(route_points):.0f} -> {geo.path_km(route_points[order]):.0f} km)"
+        )
+
+
+if __name__ == "__main__":
+    bench_planner(int(sys.argv[1]) if len(sys.argv) > 1 else 7)
+    bench_building_blocks()
@@ -0,0 +1,81 @@
+"""
+Benchmark: itinerary listing latency as the table grows.
+
+Fills a SQLite itineraries table (spread over USERS users) up to each size and
+times three ways of fetching a 20-row page for one user:
+  first    crud.list_itineraries, newest page
+  keyset   crud.list_itineraries, the page just above the user's oldest rows
+  offset   the same deep page with LIMIT/OFFSET, for comparison
+The keyset columns should stay flat; offset grows with the page depth.
+
+Usage (from backend/):
+    python benchmarks/bench_itinerary_listing.py [SIZES]    # e.g. 10000,100000,1000000
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal, create_schema  # noqa: E402
+
+USERS = 100
+PAGE = 20
+BATCH = 50_000
+
+
+def fill(db, start: int, end: int):
+    for lo in range(start, end, BATCH):
+        db.execute(insert(models.Itinerary), [
+            {"user_id": i % USERS + 1, "city": "Delhi", "days": 3, "budget": 9000, "plan": []}
+            for i in range(lo, min(lo + BATCH, end))
+        ])
+    db.commit()
+
+
+def timed(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def offset_page(db, user_id: int, offset: int):
+    return db.execute(
+        crud.itinerary_page_query(user_id, None, PAGE).offset(offset)
+    ).all()
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+    create_schema()
+    db = SessionLocal()
+    filled = 0
+    print(f"{PAGE}-row pages for one of {USERS} users (ms, best of 20)")
+    print(f"{'rows':>9} | {'first':>6} | {'keyset':>6} | {'offset':>7}")
+    for size in sizes:
+        fill(db, filled, size)
+        filled = size
+        user_id = 1
+        # Cursor just above the user's oldest PAGE rows: the deepest page
+        deep_cursor = (USERS * (PAGE + 1)) + user_id
+        depth = filled // USERS - PAGE
+
+        first_ms = timed(lambda: crud.list_itineraries(db, user_id, None, PAGE))
+        keyset_ms = timed(lambda: crud.list_itineraries(db, user_id, deep_cursor, PAGE))
+        offset_ms = timed(lambda: offset_page(db, user_id, depth))
+        print(f"{size:>9} | {first_ms:>6.2f} | {keyset_ms:>6.2f} | {offset_ms:>7.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
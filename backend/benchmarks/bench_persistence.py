@@ -0,0 +1,97 @@
+"""
+Benchmark: database round trips, bytes written and latency per stored itinerary.
+
+Saves the same locally planned itinerary ITERATIONS times in three ways:
+  legacy     the previous flow: commit, refresh, one insert per day, commit, refresh
+  bulk       crud.save_itinerary: one transaction, RETURNING, multi-row day insert
+  plan-only  crud.save_itinerary with ITINERARY_DAY_ROWS=false (no itinerary_days rows)
+Round trips are cursor executions seen by the engine. Bytes are the growth of
+the SQLite file, so they include indexes and page overhead.
+
+Usage (from backend/):
+    python benchmarks/bench_persistence.py [ITERATIONS] [DAYS]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.database import SessionLocal, create_schema, get_engine  # noqa: E402
+
+
+def legacy_save(db, itinerary_in, city, ai_data, user_id):
+    """save_itinerary as it was before the single-transaction rewrite"""
+    db_itinerary = models.Itinerary(
+        user_id=user_id, city=city.name, days=itinerary_in.days, budget=itinerary_in.budget,
+        travel_style=itinerary_in.travelStyle, accommodation=itinerary_in.accommodation,
+        pace=itinerary_in.pace, transport_mode=itinerary_in.transportMode,
+        interests=itinerary_in.interests or [], plan=ai_data
+    )
+    db.add(db_itinerary)
+    db.commit()
+    db.refresh(db_itinerary)
+    for day in ai_data:
+        db.add(models.ItineraryDay(
+            itinerary_id=db_itinerary.id, day_number=day.get('day', 1), morning=day.get('morning', ''),
+            afternoon=day.get('afternoon', ''), evening=day.get('evening', '')
+        ))
+    db.commit()
+    db.refresh(db_itinerary)
+    return db_itinerary
+
+
+def db_bytes(db) -> int:
+    return db.execute(text("PRAGMA page_count")).scalar() * db.execute(text("PRAGMA page_size")).scalar()
+
+
+def run(mode: str, iterations: int, itinerary_in, city, plan) -> dict:
+    statements = []
+    listener = lambda *args: statements.append(1)  # noqa: E731
+    crud.ITINERARY_DAY_ROWS = mode != "plan-only"
+    db = SessionLocal()
+    before = db_bytes(db)
+    event.listen(get_engine(), "before_cursor_execute", listener)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if mode == "legacy":
+            itinerary = legacy_save(db, itinerary_in, city, plan, 1)
+        else:
+            itinerary = crud.save_itinerary(db, itinerary_in, city, plan, 1)
+        # What the route does next; with the legacy flow this lazy-loads day_plans
+        schemas.ItineraryOut.model_validate(itinerary)
+    elapsed = time.perf_counter() - start
+    event.remove(get_engine(), "before_cursor_execute", listener)
+    grown = db_bytes(db) - before
+    db.close()
+    return {
+        "round_trips": len(statements) / iterations,
+        "bytes": grown / iterations,
+        "ms": elapsed * 1000 / iterations,
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    create_schema()
+    itinerary_in = schemas.ItineraryRequest(city="Delhi", days=days, budget=days * 4000, interests=["history"])
+    city = models.City(name="Delhi", country="India")
+    plan = crud.build_fallback_plan(city, itinerary_in, crud.calculate_budget(itinerary_in))
+
+    print(f"{iterations} itineraries of {days} days, SQLite file: {_db_file}")
+    print(f"{'mode':<10} | {'round trips':>11} | {'bytes/trip':>10} | {'ms/trip':>7}")
+    for mode in ("legacy", "bulk", "plan-only"):
+        stats = run(mode, iterations, itinerary_in, city, plan)
+        print(f"{mode:<10} | {stats['round_trips']:>11.1f} | {stats['bytes']:>10.0f} | {stats['ms']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: bytes per itinerary plan and read/write latency for each storage codec.
+
+Builds COUNT varied plans with the local planner: several cities, 1-10 days,
+different budgets and interests. Each storage option gets its own SQLite table:
+  json       plain JSON column (the previous storage)
+  zlib       CompressedJSON with zlib
+  zstd       CompressedJSON with zstd
+  zstd+dict  zstd with a dictionary trained on a separate sample of plans
+For each option the benchmark reports the stored value size, the file size per
+row after VACUUM, and per-row insert and point-read time.
+
+Usage (from backend/):
+    pip install zstandard
+    python benchmarks/bench_plan_storage.py [COUNT]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'unused.db')}"
+
+from sqlalchemy import JSON, Column, Integer, MetaData, Table, create_engine, select, text  # noqa: E402
+
+from app import compression, crud, models, schemas  # noqa: E402
+
+CITIES = ("Delhi", "Mumbai", "Jaipur", "Goa", "Bangalore", "Agra", "Varanasi", "Udaipur", "Pune")
+INTERESTS = ("history", "food", "nature", "shopping", "nightlife", "spiritual", "museums")
+STYLES = ("budget", "mid-range", "luxury")
+
+
+def sample_plans(count: int, seed: int):
+    rng = random.Random(seed)
+    plans = []
+    for _ in range(count):
+        days = rng.randint(1, 10)
+        request = schemas.ItineraryRequest(
+            city=rng.choice(CITIES), days=days, budget=days * rng.choice((1500, 3000, 6000, 12000)),
+            travelStyle=rng.choice(STYLES), interests=rng.sample(INTERESTS, 2),
+        )
+        city = models.City(name=request.city)
+        plans.append(crud.build_fallback_plan(city, request, crud.calculate_budget(request)))
+    return plans
+
+
+def measure(name: str, column_type, plans) -> dict:
+    path = os.path.join(_tmp, f"{name.replace('+', '_')}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    table = Table("plans", MetaData(), Column("id", Integer, primary_key=True), Column("plan", column_type))
+    table.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        start = time.perf_counter()
+        for plan in plans:
+            conn.execute(table.insert().values(plan=plan))
+        write_ms = (time.perf_counter() - start) * 1000 / len(plans)
+
+    ids = list(range(1, len(plans) + 1))
+    random.Random(1).shuffle(ids)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for row_id in ids:
+            conn.execute(select(table.c.plan).where(table.c.id == row_id)).scalar_one()
+        read_ms = (time.perf_counter() - start) * 1000 / len(plans)
+        stored = conn.execute(text("SELECT SUM(LENGTH(CAST(plan AS BLOB))) FROM plans")).scalar()
+        conn.execute(text("VACUUM"))
+        file_bytes = os.path.getsize(path)
+    engine.dispose()
+    return {"stored": stored / len(plans), "file": file_bytes / len(plans), "write_ms": write_ms, "read_ms": read_ms}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    plans = sample_plans(count, seed=0)
+    print(f"{count} plans, {sum(len(p) for p in plans) / count:.1f} days on average")
+
+    options = [("json", JSON, None), ("zlib", compression.CompressedJSON, compression.Codec("zlib"))]
+    if compression.zstandard:
+        options.append(("zstd", compression.CompressedJSON, compression.Codec("zstd", dict_path=None)))
+        dict_path = os.path.join(_tmp, "plan.dict")
+        with open(dict_path, "wb") as f:
+            # Trained on different plans than the ones measured
+            f.write(compression.train_dictionary(sample_plans(1000, seed=1)))
+        options.append(("zstd+dict", compression.CompressedJSON, compression.Codec("zstd", dict_path=dict_path)))
+    else:
+        print("zstandard not installed; skipping zstd")
+
+    print(f"{'storage':<10} | {'value B':>7} | {'file B/row':>10} | {'write ms':>8} | {'read ms':>7}")
+    for name, column_type, codec in options:
+        compression._codec = codec
+        stats = measure(name, column_type, plans)
+        print(f"{name:<10} | {stats['stored']:>7.0f} | {stats['file']:>10.0f} | "
+              f"{stats['write_ms']:>8.3f} | {stats['read_ms']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
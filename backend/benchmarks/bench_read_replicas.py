@@ -0,0 +1,129 @@
+"""
+Benchmark: read throughput with 0-3 read replicas, plus a read-your-writes check.
+
+Replicas are copies of a primary SQLite file. To model database servers with
+limited capacity, each engine's pool is capped at POOL connections, and every
+benchmark query spends QUERY_MS inside the database (a SQL function that
+sleeps). THREADS workers then read itineraries by id through ReadSession.
+Throughput should grow with the number of databases serving reads.
+
+The read-your-writes check writes a row to the primary only. It then shows
+that a replica session misses the row and that a session pinned with
+pin_primary() finds it.
+
+Usage (from backend/):
+    python benchmarks/bench_read_replicas.py [SECONDS_PER_RUN]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POOL = 4
+THREADS = 32
+QUERY_MS = 5
+ROWS = 1000
+
+_tmp = tempfile.mkdtemp()
+_primary = os.path.join(_tmp, "primary.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_primary}"
+os.environ["DB_POOL_SIZE"] = str(POOL)
+os.environ["DB_MAX_OVERFLOW"] = "0"
+
+from sqlalchemy import event, insert, text  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import crud, database, models  # noqa: E402
+
+READ = text("SELECT city FROM itineraries WHERE id = :id AND server_work(:ms) = 0")
+
+
+@event.listens_for(Engine, "connect")
+def add_server_work(dbapi_connection, _):
+    dbapi_connection.create_function("server_work", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+
+def seed():
+    database.create_schema()
+    db = database.SessionLocal()
+    db.execute(insert(models.Itinerary), [
+        {"user_id": i % 50 + 1, "city": "Delhi", "days": 3, "budget": 9000, "plan": []} for i in range(ROWS)
+    ])
+    db.commit()
+    db.close()
+
+
+def use_replicas(count: int):
+    for replica in database.replica_engines or []:
+        replica.dispose()
+    urls = []
+    for i in range(1, count + 1):
+        path = os.path.join(_tmp, f"replica{i}.db")
+        shutil.copy(_primary, path)
+        urls.append(f"sqlite:///{path}")
+    database.DATABASE_REPLICA_URLS = urls
+    database.replica_engines = None
+
+
+def throughput(seconds: float) -> float:
+    stop = time.perf_counter() + seconds
+    counts = []
+
+    def worker():
+        rng = random.Random()
+        done = 0
+        while time.perf_counter() < stop:
+            db = database.ReadSessionLocal()
+            try:
+                db.execute(READ, {"id": rng.randint(1, ROWS), "ms": QUERY_MS}).scalar()
+            finally:
+                db.close()
+            done += 1
+        counts.append(done)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def check_read_your_writes():
+    use_replicas(1)
+    primary = database.SessionLocal()
+    itinerary = crud.save_itinerary(
+        primary, crud.schemas.ItineraryRequest(city="Delhi", days=1, budget=3000),
+        models.City(name="Delhi"), [{"day": 1, "morning": "", "afternoon": "", "evening": ""}], user_id=7
+    )
+    primary.close()
+
+    replica = database.ReadSessionLocal()
+    on_replica = crud.get_itinerary(replica, itinerary.id) is not None
+    replica.close()
+    pinned = database.ReadSessionLocal()
+    database.pin_primary(pinned)
+    on_primary = crud.get_itinerary(pinned, itinerary.id) is not None
+    pinned.close()
+    print(f"read-your-writes: new row on replica={on_replica}, on pinned session={on_primary}")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    seed()
+    print(f"{THREADS} reader threads, {POOL} connections and {QUERY_MS} ms per query on each database")
+    print(f"{'replicas':>8} | {'reads/s':>8}")
+    for count in range(4):
+        use_replicas(count)
+        print(f"{count:>8} | {throughput(seconds):>8.0f}")
+    check_read_your_writes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: free-text prompt + fence stripping (legacy) vs. schema-constrained output.
+
+For each mode, generates TRIALS itineraries, walking GEMINI_MODELS in order until
+one answers. Reports success rate, model attempts per trip (retries), and
+prompt/response token usage from usage_metadata.
+
+Needs GEMINI_API_KEY (uses real quota). Without a key it only compares prompt sizes.
+
+Usage (from backend/):
+    python benchmarks/bench_structured_output.py [TRIALS]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import crud  # noqa: E402
+
+TRIP = dict(
+    city_name="Jaipur", days=4, total_budget=20000, daily_budget=5000, daily_food=1250,
+    daily_activities=1250, daily_transport=750, travel_style="mid-range",
+    interests_str="history, food", transport_mode="public transport",
+)
+
+
+def legacy_prompt(city_name, days, total_budget, daily_budget, daily_food, daily_activities,
+                  daily_transport, travel_style, interests_str, transport_mode):
+    # The itinerary prompt as sent before structured output
+    return f"""
+You are an expert travel planner for India. Create a {days}-day trip to {city_name}.
+
+BUDGET (STRICTLY FOLLOW):
+- Total: ₹{total_budget}
+- Per Day: ₹{daily_budget}
+- Food/day: ₹{daily_food}
+- Activities/day: ₹{daily_activities}
+- Transport/day: ₹{daily_transport}
+
+PREFERENCES:
+- Style: {travel_style}
+- Interests: {interests_str}
+- Transport: {transport_mode}
+
+RULES:
+1. Use REAL places in {city_name} (real restaurants, real monuments)
+2. Include ₹ cost for EVERY activity and meal
+3. Stay within daily budget of ₹{daily_budget}
+4. {"Suggest street food, free attractions, budget stays" if daily_budget < 1000 else "Suggest affordable restaurants, popular spots" if daily_budget < 3000 else "Suggest good restaurants, premium experiences"}
+
+OUTPUT: Return ONLY valid JSON array, no markdown:
+[
+  {{"day": 1, "morning": "8 AM - Breakfast at [Place] (₹XX) → 10 AM - Visit [Place] (₹XX) | Travel: ₹XX", "afternoon": "1 PM - Lunch at [Place] (₹XX) → 3 PM - [Activity] (₹XX) | Travel: ₹XX", "evening": "7 PM - Dinner at [Place] (₹XX) → [Activity] | Travel: ₹XX"}}
+]
+
+Generate exactly {days} days.
+"""
+
+
+def legacy_parse(text):
+    clean_text = text.strip()
+    if "```json" in clean_text:
+        clean_text = clean_text.split("```json")[1].split("```")[0]
+    elif "```" in clean_text:
+        clean_text = clean_text.split("```")[1].split("```")[0]
+    data = json.loads(clean_text.strip())
+    if not (isinstance(data, list) and data):
+        raise ValueError("empty plan")
+    return data
+
+
+def run_mode(client, mode, trials):
+    stats = {"ok": 0, "attempts": 0, "prompt_tokens": 0, "response_tokens": 0, "seconds": 0.0}
+    for _ in range(trials):
+        start = time.perf_counter()
+        for model_name in crud.GEMINI_MODELS:
+            stats["attempts"] += 1
+            try:
+                if mode == "legacy":
+                    response = client.models.generate_content(model=model_name, contents=legacy_prompt(**TRIP))
+                else:
+                    response = client.models.generate_content(
+                        model=model_name, contents=crud.build_itinerary_prompt(**TRIP), config=crud.json_config()
+                    )
+                usage = response.usage_metadata
+                if usage:
+                    stats["prompt_tokens"] += usage.prompt_token_count or 0
+                    stats["response_tokens"] += usage.candidates_token_count or 0
+                if mode == "legacy":
+                    legacy_parse(response.text)
+                else:
+                    crud.parse_ai_response(response.text)
+                stats["ok"] += 1
+                break
+            except Exception as e:
+                print(f"  {mode} {model_name}: {crud.classify_error(e)}")
+        stats["seconds"] += time.perf_counter() - start
+    return stats
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    old_prompt, new_prompt = legacy_prompt(**TRIP), crud.build_itinerary_prompt(**TRIP)
+    print(f"Prompt size: legacy {len(old_prompt)} chars, structured {len(new_prompt)} chars")
+
+    if not crud.gemini_client:
+        print("GEMINI_API_KEY not set; skipping live comparison")
+        return
+
+    print(f"\n{'mode':<11}| success | attempts/trip | prompt tok/trip | response tok/trip | s/trip")
+    for mode in ("legacy", "structured"):
+        stats = run_mode(crud.gemini_client, mode, trials)
+        print(
+            f"{mode:<11}| {stats['ok']:>3}/{trials:<3} | {stats['attempts'] / trials:>13.2f} | "
+            f"{stats['prompt_tokens'] / trials:>15.0f} | {stats['response_tokens'] / trials:>17.0f} | "
+            f"{stats['seconds'] / trials:>6.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
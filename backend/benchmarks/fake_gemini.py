@@ -0,0 +1,145 @@
+"""
+Local stand-in for google.genai.Client, for load tests that must not use real quota.
+
+Supports models.generate_content, aio.models.generate_content and
+aio.models.generate_content_stream. Behaviour is configurable:
+- latency: "fixed:0.8", "uniform:0.5,2", or "lognormal:1.2,0.5" (median seconds, sigma)
+- error injection: probabilities of a 429, a 404 and a malformed-JSON reply
+- replies: canned multi-day plans sized from the prompt ("Exactly N days",
+  "numbered X to Y"), or a list of place names for the attraction outline call
+
+Usage:
+    from benchmarks.fake_gemini import FakeGeminiClient
+    crud.gemini_client = FakeGeminiClient(latency="lognormal:1.5,0.4", rate_429=0.1)
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from google.genai import errors, types
+
+
+def parse_latency(spec: str):
+    """Return a zero-argument sampler (seconds) for a latency spec string"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def canned_plan(prompt: str) -> list:
+    match = re.search(r"numbered (\d+) to (\d+)", prompt)
+    if match:
+        start, end = int(match.group(1)), int(match.group(2))
+    else:
+        match = re.search(r"Exactly (\d+) days", prompt)
+        start, end = 1, int(match.group(1)) if match else 3
+    city = re.search(r"trip to ([^.]+)\.", prompt)
+    city = city.group(1) if city else "the city"
+    return [
+        {
+            "day": day,
+            "morning": f"8 AM - Breakfast at {city} Cafe {day} (₹150) → 10 AM - Visit {city} Fort {day} (₹50) | Travel: ₹60",
+            "afternoon": f"1 PM - Lunch at Thali House {day} (₹250) → 3 PM - {city} Museum {day} (₹100) | Travel: ₹60",
+            "evening": f"7 PM - Dinner at Rooftop {day} (₹400) → Night market walk | Travel: ₹80",
+        }
+        for day in range(start, end + 1)
+    ]
+
+
+def canned_names(prompt: str) -> list:
+    match = re.search(r"List (\d+)", prompt)
+    count = int(match.group(1)) if match else 10
+    return [f"Attraction {i}" for i in range(1, count + 1)]
+
+
+class _FakeModelsBase:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def _reply(self, model: str, contents: str):
+        """Decide the outcome of one call: raise an injected error or return reply text"""
+        owner = self.owner
+        owner.calls += 1
+        roll = random.random()
+        if roll < owner.rate_404 or model in owner.missing_models:
+            raise errors.ClientError(404, {"error": {"code": 404, "message": f"{model} not found", "status": "NOT_FOUND"}})
+        roll -= owner.rate_404
+        if roll < owner.rate_429:
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+        roll -= owner.rate_429
+        if roll < owner.rate_malformed:
+            return '[{"day": 1, "morning": "truncated'
+        data = canned_names(contents) if contents.startswith("List ") else canned_plan(contents)
+        return json.dumps(data, ensure_ascii=False)
+
+    @staticmethod
+    def _response(text: str, contents: str):
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=len(contents) // 4, candidates_token_count=len(text) // 4
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class FakeSyncModels(_FakeModelsBase):
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.owner.sample_latency())
+        return self._response(self._reply(model, contents), contents)
+
+
+class FakeAsyncModels(_FakeModelsBase):
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.owner.sample_latency())
+        return self._response(self._reply(model, contents), contents)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        # Latency is time-to-first-token; the rest of the reply streams in ~10 chunks
+        first_token = self.owner.sample_latency() * self.owner.first_token_fraction
+        text = self._reply(model, contents)
+        rest = self.owner.sample_latency() - first_token
+
+        async def chunks():
+            await asyncio.sleep(first_token)
+            size = max(1, len(text) // 10)
+            for i in range(0, len(text), size):
+                last = i + size >= len(text)
+                yield self._response(text[i:i + size], contents) if last else SimpleNamespace(
+                    text=text[i:i + size], usage_metadata=None
+                )
+                await asyncio.sleep(max(rest, 0) / 10)
+
+        return chunks()
+
+
+class FakeGeminiClient:
+    def __init__(
+        self,
+        latency: str = "lognormal:1.5,0.4",
+        rate_429: float = 0.0,
+        rate_404: float = 0.0,
+        rate_malformed: float = 0.0,
+        missing_models=(),
+        first_token_fraction: float = 0.3,
+        seed=None,
+    ):
+        if seed is not None:
+            random.seed(seed)
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_404 = rate_404
+        self.rate_malformed = rate_malformed
+        self.missing_models = set(missing_models)
+        self.first_token_fraction = first_token_fraction
+        self.calls = 0
+        self.models = FakeSyncModels(self)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self))
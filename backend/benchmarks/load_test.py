@@ -0,0 +1,139 @@
+"""
+Offline load test for POST /api/itineraries against the full FastAPI app.
+
+Gemini is replaced by benchmarks/fake_gemini.FakeGeminiClient, so no quota is
+used. The database is a throwaway SQLite file unless --database-url points at
+a local Postgres. Three paths are measured:
+- ai:       every request is a distinct trip (result-cache miss, fake Gemini call)
+- fallback: no Gemini client, so the local planner serves every request
+- cached:   one warm-up request, then identical trips from different users
+
+Usage (from backend/):
+    pip install httpx
+    python benchmarks/load_test.py --requests 200 --concurrency 32 --latency lognormal:1.5,0.4 --rate-429 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--latency", default="lognormal:1.0,0.4", help="fake Gemini latency spec")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-404", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--scenarios", default="ai,fallback,cached")
+    parser.add_argument("--database-url", default=os.getenv("LOAD_TEST_DATABASE_URL"))
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+os.environ.setdefault("TELEMETRY_LOGS_ENABLED", "false")
+os.environ.setdefault("JOB_WORKER_CONCURRENCY", "0")
+
+import httpx  # noqa: E402
+
+from app import crud, models, result_cache  # noqa: E402
+from app.database import SessionLocal, create_schema  # noqa: E402
+from app.main import app  # noqa: E402
+from app.model_health import model_health  # noqa: E402
+from benchmarks.fake_gemini import FakeGeminiClient  # noqa: E402
+
+CITY = "Delhi"
+
+
+def seed():
+    # ASGITransport doesn't run the lifespan, which normally creates the schema
+    create_schema()
+    db = SessionLocal()
+    if not db.query(models.City).filter(models.City.name == CITY).first():
+        db.add(models.City(name=CITY, country="India"))
+        db.commit()
+    result_cache.invalidate(db)
+    db.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def drive(client, make_request, total, concurrency):
+    """Run total requests with at most concurrency in flight; returns (latencies_ms, failures, elapsed)"""
+    latencies, failures = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            i = queue.get_nowait()
+            path, params, payload = make_request(i)
+            start = time.perf_counter()
+            response = await client.post(path, params=params, json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, failures, time.perf_counter() - start
+
+
+def trip(budget):
+    return {"city": CITY, "days": args.days, "budget": budget, "interests": ["history", "food"]}
+
+
+async def run_scenario(client, name):
+    seed()
+    model_health.reset()
+    fake = FakeGeminiClient(
+        latency=args.latency, rate_429=args.rate_429, rate_404=args.rate_404, rate_malformed=args.rate_malformed
+    )
+    crud.gemini_client = None if name == "fallback" else fake
+    step = result_cache.RESULT_CACHE_BUDGET_STEP * args.days
+
+    if name == "cached":
+        await client.post("/api/itineraries/", json=trip(10000))
+        fake.calls = 0
+        # Different users, so requests hit the result cache rather than per-user coalescing
+        make_request = lambda i: ("/api/itineraries/", {"user_id": 1000 + i}, trip(10000))  # noqa: E731
+    else:
+        # Budgets a full bucket apart: every request is its own cache key
+        make_request = lambda i: ("/api/itineraries/", None, trip(10000 + step * (i + 1)))  # noqa: E731
+
+    latencies, failures, elapsed = await drive(client, make_request, args.requests, args.concurrency)
+    print(
+        f"{name:<9}| {args.requests:>5} | {failures:>4} | {args.requests / elapsed:>8.1f} | "
+        f"{percentile(latencies, 50):>8.1f} | {percentile(latencies, 95):>8.1f} | "
+        f"{percentile(latencies, 99):>8.1f} | {fake.calls:>6}"
+    )
+
+
+async def main():
+    print(
+        f"DB={os.environ['DATABASE_URL'].split('@')[-1]} concurrency={args.concurrency} days={args.days} "
+        f"latency={args.latency} 429={args.rate_429} 404={args.rate_404} malformed={args.rate_malformed}"
+    )
+    print("scenario | reqs | fail |  req/s  |  p50 ms  |  p95 ms  |  p99 ms  | gemini calls")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        for name in args.scenarios.split(","):
+            await run_scenario(client, name.strip())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
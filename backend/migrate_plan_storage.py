@@ -0,0 +1,129 @@
+"""
+Migrate itineraries.plan to compressed storage, in place.
+
+1. On PostgreSQL, converts the json column to bytea. The text is kept, and
+   CompressedJSON can read it as is. SQLite needs no schema change. This step
+   is required before deploying compressed storage (the app won't start on a
+   json column): run it with --convert-only while the app is stopped.
+2. Rewrites every plan not yet stored with the current codec (PLAN_COMPRESSION,
+   PLAN_ZSTD_DICT), in id order and in batches. Each batch commits separately,
+   so the app keeps running and an interrupted run can simply be started again.
+   Changing the codec later and rerunning recompresses everything.
+
+--train-dict writes a zstd dictionary trained on a sample of stored plans and
+exits. Point PLAN_ZSTD_DICT at the file, then run the migration again.
+
+Usage (from backend/):
+    python migrate_plan_storage.py --convert-only
+    python migrate_plan_storage.py --dry-run
+    python migrate_plan_storage.py --batch 500
+    python migrate_plan_storage.py --train-dict plan.dict && PLAN_ZSTD_DICT=plan.dict python migrate_plan_storage.py
+"""
+import argparse
+import time
+
+from sqlalchemy import LargeBinary, bindparam, select, text, type_coerce, update
+
+from app import compression, models
+from app.database import SessionLocal, get_engine
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="count rows to rewrite and exit")
+    parser.add_argument("--convert-only", action="store_true", help="convert the PostgreSQL column and exit")
+    parser.add_argument("--train-dict", metavar="PATH", help="train a zstd dictionary on stored plans and exit")
+    parser.add_argument("--dict-samples", type=int, default=2000)
+    parser.add_argument("--dict-size", type=int, default=16 * 1024)
+    return parser.parse_args()
+
+
+def convert_column():
+    """json -> bytea on PostgreSQL, keeping each value's JSON text"""
+    engine = get_engine()
+    if not compression.plan_column_needs_conversion(engine):
+        return
+    print("🔧 Converting itineraries.plan to bytea")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE itineraries ALTER COLUMN plan TYPE bytea USING convert_to(plan::text, 'UTF8')"))
+
+
+# The stored bytes (or legacy text), without CompressedJSON's decoding
+RAW_PLAN = type_coerce(models.Itinerary.plan, LargeBinary)
+_table = models.Itinerary.__table__
+REWRITE = (
+    update(_table).where(_table.c.id == bindparam("row_id"))
+    .values(plan=bindparam("encoded", type_=LargeBinary))
+)
+
+
+def batches(db, size: int):
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(models.Itinerary.id, RAW_PLAN).where(models.Itinerary.id > last_id)
+            .order_by(models.Itinerary.id).limit(size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def stored_size(data) -> int:
+    return len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+
+
+def train(db, path: str, samples: int, size: int):
+    rows = db.execute(select(RAW_PLAN).order_by(models.Itinerary.id.desc()).limit(samples)).scalars().all()
+    codec = compression.get_codec()
+    dictionary = compression.train_dictionary([codec.decode(row) for row in rows], size)
+    with open(path, "wb") as f:
+        f.write(dictionary)
+    print(f"📚 Trained a {len(dictionary)} byte dictionary on {len(rows)} plans: {path}")
+
+
+def migrate(db, batch: int, dry_run: bool):
+    codec = compression.get_codec()
+    seen = rewritten = before = after = 0
+    start = time.perf_counter()
+    for rows in batches(db, batch):
+        updates = []
+        for itinerary_id, data in rows:
+            seen += 1
+            if compression.is_compressed(data):
+                continue
+            encoded = codec.encode(codec.decode(data))
+            before += stored_size(data)
+            after += len(encoded)
+            updates.append({"row_id": itinerary_id, "encoded": encoded})
+        rewritten += len(updates)
+        if updates and not dry_run:
+            db.execute(REWRITE, updates)
+            db.commit()
+    elapsed = time.perf_counter() - start
+    verb = "Would rewrite" if dry_run else "Rewrote"
+    print(f"✅ {verb} {rewritten} of {seen} plans with {codec.method} in {elapsed:.1f}s")
+    if rewritten:
+        print(f"   {before / rewritten:.0f} -> {after / rewritten:.0f} bytes per plan ({after / before:.0%})")
+
+
+def main():
+    args = parse_args()
+    db = SessionLocal()
+    try:
+        if args.train_dict:
+            train(db, args.train_dict, args.dict_samples, args.dict_size)
+            return
+        if not args.dry_run:
+            convert_column()
+        if args.convert_only:
+            return
+        migrate(db, args.batch, args.dry_run)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Pre-generate itineraries for popular trip combinations into the result cache.
+
+Each (city, days, profile, daily budget bucket) combination is generated once
+with Gemini and stored in itinerary_plan_cache. A profile is the travel style,
+transport mode and interests, normalized as result_cache.plan_profile does for
+live requests (empty fields count as their defaults). By default the profiles
+are the ones most often seen in the itineraries table, so they match what the
+form actually sends. --styles (with --interests) builds them by hand instead.
+City names go through the city resolver, so "Bangalore" finds "Bengaluru".
+
+The run is resumable. Combinations that already have a fresh cache entry are
+skipped, so an interrupted run can simply be started again.
+
+Usage (from backend/, needs GEMINI_API_KEY):
+    python pregenerate_plans.py --dry-run
+    python pregenerate_plans.py --top 10 --days 2,3,5 --rate 30 --concurrency 4
+    python pregenerate_plans.py --cities Delhi,Jaipur --styles budget --daily-budgets 1000,2500
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import city_index, crud, models, result_cache, schemas
+from app.database import SessionLocal
+
+# Used when the itineraries table doesn't have enough history yet
+DEFAULT_CITIES = ["Delhi", "Mumbai", "Jaipur", "Panjim", "Bengaluru", "Agra", "Varanasi", "Udaipur"]
+# Recent itineraries scanned for common profiles
+PROFILE_HISTORY = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", help="comma-separated city names (default: most requested)")
+    parser.add_argument("--top", type=int, default=8, help="number of popular cities when --cities isn't given")
+    parser.add_argument("--days", default="2,3,4,5,7")
+    parser.add_argument("--profiles", type=int, default=4, help="number of common profiles from history")
+    parser.add_argument("--styles", help="comma-separated travel styles, instead of profiles from history")
+    parser.add_argument("--daily-budgets", default="1000,2500,5000", help="₹ per day; one entry per cache bucket")
+    parser.add_argument("--interests", action="append", default=[],
+                        help="comma-separated interest set for --styles; repeat for several (default: none)")
+    parser.add_argument("--rate", type=float, default=20, help="max generations started per minute")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="list what would be generated and exit")
+    return parser.parse_args()
+
+
+def split(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def popular_cities(db, top: int) -> list:
+    """Most requested cities first, topped up with DEFAULT_CITIES"""
+    rows = (
+        db.query(models.Itinerary.city, func.count(models.Itinerary.id).label("n"))
+        .group_by(models.Itinerary.city)
+        .order_by(func.count(models.Itinerary.id).desc())
+        .limit(top)
+        .all()
+    )
+    names = [row.city for row in rows]
+    for name in DEFAULT_CITIES:
+        if len(names) >= top:
+            break
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def popular_profiles(db, top: int) -> list:
+    """Most common (travel style, transport mode, interests) among recent itineraries"""
+    rows = (
+        db.query(models.Itinerary.travel_style, models.Itinerary.transport_mode, models.Itinerary.interests)
+        .order_by(models.Itinerary.id.desc())
+        .limit(PROFILE_HISTORY)
+        .all()
+    )
+    counts = Counter(json.dumps(result_cache.plan_profile(*row), sort_keys=True) for row in rows)
+    profiles = [json.loads(profile) for profile, _ in counts.most_common(top)]
+    # No history yet: what the form sends with every optional field left empty
+    return profiles or [result_cache.plan_profile(None, None, [])]
+
+
+def given_profiles(args) -> list:
+    interest_sets = [split(value) for value in args.interests] or [[]]
+    return [
+        result_cache.plan_profile(style, None, interests)
+        for style, interests in itertools.product(split(args.styles), interest_sets)
+    ]
+
+
+def build_requests(args, cities: list, profiles: list) -> list:
+    """One ItineraryRequest per combination, with a budget in the middle of its cache bucket"""
+    step = max(result_cache.RESULT_CACHE_BUDGET_STEP, 1)
+    requests, seen = [], set()
+    for city, days, profile, daily in itertools.product(
+        cities, [int(d) for d in split(args.days)], profiles, [int(b) for b in split(args.daily_budgets)]
+    ):
+        bucket_mid = (daily // step) * step + step // 2
+        request = schemas.ItineraryRequest(
+            city=city, days=days, budget=bucket_mid * days, travelStyle=profile["travel_style"],
+            transportMode=profile["transport_mode"], interests=profile["interests"]
+        )
+        key = result_cache.make_cache_key(request, city)
+        if key not in seen:
+            seen.add(key)
+            requests.append((key, request))
+    return requests
+
+
+def is_fresh(db, key: str) -> bool:
+    cutoff = datetime.utcnow() - timedelta(seconds=result_cache.RESULT_CACHE_DB_TTL_SECONDS)
+    return db.query(models.CachedItineraryPlan.key).filter(
+        models.CachedItineraryPlan.key == key,
+        models.CachedItineraryPlan.created_at >= cutoff
+    ).first() is not None
+
+
+def store(key: str, city_name: str, plan: list):
+    db = SessionLocal()
+    try:
+        result_cache.store_plan(db, key, city_name, plan)
+    finally:
+        db.close()
+
+
+class RateLimiter:
+    """Spaces out acquisitions to at most rate per minute"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def generate_all(pending: list, cities: dict, rate: float, concurrency: int) -> dict:
+    limiter = RateLimiter(rate)
+    queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    stats = {"stored": 0, "failed": 0}
+
+    async def worker():
+        while not queue.empty():
+            key, request = queue.get_nowait()
+            await limiter.acquire()
+            city = cities[request.city]
+            ai_kwargs = crud.build_ai_kwargs(city, request, crud.calculate_budget(request))
+            start = time.perf_counter()
+            plan = await crud.generate_plan_async(**ai_kwargs)
+            label = f"{request.city} {request.days}d {request.travelStyle} ₹{request.budget}"
+            if crud.is_complete_plan(plan, request.days):
+                # Written straight away, so an interrupted run keeps everything finished so far
+                await asyncio.to_thread(store, key, city.name, plan)
+                stats["stored"] += 1
+                print(f"✅ {label} ({time.perf_counter() - start:.1f}s)")
+            else:
+                stats["failed"] += 1
+                print(f"❌ {label}: no complete plan, will retry on the next run")
+
+    await asyncio.gather(*[worker() for _ in range(max(concurrency, 1))])
+    return stats
+
+
+def main():
+    args = parse_args()
+    db = SessionLocal()
+    try:
+        names = split(args.cities) if args.cities else popular_cities(db, args.top)
+        cities = {}
+        for name in names:
+            resolution = city_index.resolve(name)
+            city = db.get(models.City, resolution.city["id"]) if resolution.city else None
+            if city:
+                db.expunge(city)
+                # Keyed by the stored name, which is what live requests' cache keys use
+                cities[city.name] = city
+            else:
+                hint = ", ".join(c["name"] for c in resolution.suggestions)
+                print(f"⚠️ Skipping unknown city: {name}" + (f" (did you mean {hint}?)" if hint else ""))
+
+        profiles = given_profiles(args) if args.styles else popular_profiles(db, args.profiles)
+        combos = build_requests(args, list(cities), profiles)
+        pending = [(key, request) for key, request in combos if not is_fresh(db, key)]
+    finally:
+        db.close()
+
+    print(f"📋 {len(combos)} combinations, {len(combos) - len(pending)} already cached, {len(pending)} to generate")
+    if args.dry_run:
+        for _, request in pending:
+            print(f"   {request.city} {request.days}d {request.travelStyle} / {request.transportMode} "
+                  f"₹{request.budget} {request.interests}")
+        return
+    if not pending:
+        return
+    if not result_cache.RESULT_CACHE_ENABLED:
+        print("❌ RESULT_CACHE_ENABLED is false; nothing would be stored")
+        return
+    if not crud.init_gemini_client():
+        print("❌ GEMINI_API_KEY not set")
+        return
+
+    stats = asyncio.run(generate_all(pending, cities, args.rate, args.concurrency))
+    print(f"🎉 Stored {stats['stored']} plans, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
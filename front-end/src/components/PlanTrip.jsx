@@ -1,14 +1,18 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import api from "../services/api.js";
 import "../pages/PlanTrip.css";
 import { useNavigate } from "react-router-dom";
 
 const PlanTrip = () => {
-  const [cities, setCities] = useState([]);
   const [filteredCities, setFilteredCities] = useState([]);
+  // Autocomplete: debounce keystrokes and drop responses to older queries
+  const searchRef = useRef({ timer: null, latest: 0 });
   const [showDropdown, setShowDropdown] = useState(false);
 
   const navigate = useNavigate();
+  // One Idempotency-Key per distinct form submission, reused on retries
+  const idempotencyRef = useRef({ key: null, body: null });
+  const [submitting, setSubmitting] = useState(false);
   const [form, setForm] = useState({
     name: "",
     email: "",
@@ -22,18 +26,20 @@ const PlanTrip = () => {
     interests: [],
   });
 
-  useEffect(() => {
-    const fetchCities = async () => {
+  const searchCities = (query) => {
+    clearTimeout(searchRef.current.timer);
+    searchRef.current.timer = setTimeout(async () => {
+      const requestId = ++searchRef.current.latest;
       try {
-        const res = await api.get("/cities");
-        setCities(res.data);
-        setFilteredCities(res.data);
+        const res = await api.get("/cities/search", { params: { q: query, limit: 8 } });
+        if (requestId === searchRef.current.latest) setFilteredCities(res.data);
       } catch (err) {
-        console.error("Error loading cities", err);
+        console.error("Error searching cities", err);
       }
-    };
-    fetchCities();
-  }, []);
+    }, 150);
+  };
+
+  useEffect(() => () => clearTimeout(searchRef.current.timer), []);
 
   const handleCheckboxChange = (interest) => {
     const updated = [...form.interests];
@@ -51,15 +57,29 @@ const PlanTrip = () => {
       alert("Please fill in the required fields (City, Days, Budget)");
       return;
     }
-try {
-      const response = await api.post("/itineraries", form);
+    if (submitting) return;
+
+    const body = JSON.stringify(form);
+    if (idempotencyRef.current.body !== body) {
+      idempotencyRef.current = { key: crypto.randomUUID(), body };
+    }
+
+    setSubmitting(true);
+    try {
+      const response = await api.post("/itineraries", form, {
+        headers: { "Idempotency-Key": idempotencyRef.current.key },
+      });
     
       console.log("Success:", response.data);
       alert("Itinerary Generated!");
       navigate(`/trip/${response.data.id}`);
     } catch (error) {
       console.error("Error creating itinerary:", error);
-      alert("Failed to create plan. Make sure you are logged in or the backend is running.");
+      // Unknown cities come back as 404s with "Did you mean" suggestions
+      const detail = error.response?.status === 404 && error.response.data?.detail;
+      alert(detail || "Failed to create plan. Make sure you are logged in or the backend is running.");
+    } finally {
+      setSubmitting(false);
     }
   };
 
@@ -77,16 +97,14 @@ try {
             placeholder="Search City..."
             value={form.city}
             onChange={(e) => {
-              const typed = e.target.value.toLowerCase();
               setForm({ ...form, city: e.target.value });
-
-              const filtered = cities.filter((city) =>
-                city.name.toLowerCase().includes(typed)
-              );
-              setFilteredCities(filtered);
+              searchCities(e.target.value);
+              setShowDropdown(true);
+            }}
+            onFocus={() => {
+              searchCities(form.city);
               setShowDropdown(true);
             }}
-            onFocus={() => setShowDropdown(true)}
           />
 
           {showDropdown && filteredCities.length > 0 && (
@@ -114,6 +132,7 @@ try {
           value={form.days}
           onChange={(e) => setForm({ ...form, days: e.target.value })}
           min="1"
+          max="30"
         />
 
         <input
@@ -192,8 +211,8 @@ try {
           ))}
         </div>
 
-        <button className="submit-btn" type="submit">
-          Generate AI Itinerary
+        <button className="submit-btn" type="submit" disabled={submitting}>
+          {submitting ? "Generating..." : "Generate AI Itinerary"}
         </button>
       </form>
     </div>